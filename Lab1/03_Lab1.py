@@ -13,6 +13,9 @@ from OpenGL.GLU import *
 from OpenGL.GLUT import *
 from OpenGL.arrays.numpymodule import ARRAY_TO_GL_TYPE_MAPPING
 
+from lut import COLORMAPS, apply_lut
+from masks import PRESETS, apply_mask, get_mask
+
 DEFAULT_IMAGE_PATH = (
     Path(__file__).resolve().parents[1]
     / "Images"
@@ -29,58 +32,20 @@ def load_texture(pixels, type):
     glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
 
 
-def transform_color_channel(pixels):
-    global height, width
-    rgb = np.zeros((height, width, 3), 'uint8')
-    rgb[..., 0] = pixels
-    rgb[..., 1] = 0
-    rgb[..., 2] = 0
-    return rgb
+def transform_color_channel(pixels, colormap='red'):
+    return apply_lut(pixels, colormap)
 
 
 def transform_gradient(pixels):
-    gradient = {}
-    color = 255
-    for key in range(np.amin(pixels), (np.amax(pixels) // 2)):
-        gradient[key] = color
-        color -= 2
-    gradient[np.amax(pixels) // 2] = 0
-    color = 255
-    for key in range(np.amax(pixels), (np.amax(pixels) // 2) + 1, -1):
-        gradient[key] = color
-        color -= 2
-    gradient[(np.amax(pixels) // 2) + 1] = 0
-    output = []
-    for pixel_list in pixels:
-        output_inner = []
-        for pixel in pixel_list:
-            output_inner.append(gradient[pixel])
-        output.append(output_inner)
-    return np.array(output)
+    return apply_lut(pixels)
 
 
 def transform_background(pixels):
-    result = []
-    bit_map = bit_mask(pixels)
-    for i, row in enumerate(pixels):
-        new_row = []
-        for j, pixel in enumerate(row):
-            new_row.append(bit_map[i][j] & pixel)
-        result.append(new_row)
-    return np.array(result, np.uint8)
+    return apply_mask(pixels, bit_mask(pixels))
 
 
 def bit_mask(pixels):
-    bit_map = []
-    for i, row in enumerate(pixels):
-        new_row = []
-        for j, pixel in enumerate(row):
-            bit_map_value = 0
-            if i < width / 2:
-                bit_map_value = 255
-            new_row.append(bit_map_value)
-        bit_map.append(new_row)
-    return bit_map
+    return get_mask(mask_name, pixels.shape[-2:])
 
 
 def keyboard(key, x, y):
@@ -92,7 +57,7 @@ def keyboard(key, x, y):
         load_texture(new_pixels, GL_LUMINANCE)
         display()
     elif key == b'c':
-        new_pixels = transform_color_channel(transform_gradient(np.array(image.pixel_array)))
+        new_pixels = transform_color_channel(image.pixel_array, colormap)
         load_texture(new_pixels, GL_RGB)
         display()
     elif key == b'r':
@@ -136,7 +101,10 @@ def load_image(filename):
     height = image['0028', '0010'].value
 
 
-def main(filename):
+def main(filename, color_map='red', mask='half'):
+    global colormap, mask_name
+    colormap = color_map
+    mask_name = mask
     glutInit(sys.argv)
     glutInitDisplayMode(GLUT_SINGLE | GLUT_RGB)
     load_image(filename)
@@ -158,9 +126,20 @@ def parse_args():
         default=DEFAULT_IMAGE_PATH,
         help="Path to the DICOM image.",
     )
+    parser.add_argument(
+        "--colormap",
+        choices=sorted(COLORMAPS),
+        default="red",
+        help="Colormap applied to the gradient on the 'c' key.",
+    )
+    parser.add_argument(
+        "--mask",
+        default="half",
+        help=f"Mask applied on the 'b' key: a preset ({', '.join(PRESETS)}) or a path to a boolean .npy mask.",
+    )
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = parse_args()
-    main(str(args.image))
+    main(str(args.image), args.colormap, args.mask)
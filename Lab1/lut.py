@@ -0,0 +1,62 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+from functools import lru_cache
+
+import numpy as np
+
+# Colormap control points: (position, r, g, b)
+COLORMAPS = {
+    'gray': [(0.0, 0, 0, 0), (1.0, 255, 255, 255)],
+    'red': [(0.0, 0, 0, 0), (1.0, 255, 0, 0)],
+    'green': [(0.0, 0, 0, 0), (1.0, 0, 255, 0)],
+    'blue': [(0.0, 0, 0, 0), (1.0, 0, 0, 255)],
+    'hot': [(0.0, 0, 0, 0), (0.375, 255, 0, 0), (0.75, 255, 255, 0), (1.0, 255, 255, 255)],
+    'jet': [
+        (0.0, 0, 0, 128),
+        (0.125, 0, 0, 255),
+        (0.375, 0, 255, 255),
+        (0.625, 255, 255, 0),
+        (0.875, 255, 0, 0),
+        (1.0, 128, 0, 0),
+    ],
+}
+
+
+@lru_cache(maxsize=None)
+def colormap_table(name):
+    points = np.array(COLORMAPS[name], dtype=float)
+    levels = np.linspace(0.0, 1.0, 256)
+    table = np.empty((256, 3), np.uint8)
+    for channel in range(3):
+        table[:, channel] = np.round(np.interp(levels, points[:, 0], points[:, channel + 1]))
+    table.setflags(write=False)
+    return table
+
+
+# V-shaped gradient: 255 at both ends of the range, 0 in the middle, step 2
+def gradient_table(min_value, max_value):
+    values = np.arange(min_value, max_value + 1, dtype=np.int64)
+    middle = max_value // 2
+    table = np.where(values <= middle, 255 - 2 * (values - min_value), 255 - 2 * (max_value - values))
+    table[(values == middle) | (values == middle + 1)] = 0
+    return np.clip(table, 0, 255).astype(np.uint8)
+
+
+# LUTs are cached per (min, max) range, so reapplying one is instant
+@lru_cache(maxsize=32)
+def get_lut(min_value, max_value, colormap=None):
+    lut = gradient_table(min_value, max_value)
+    if colormap is not None:
+        lut = colormap_table(colormap)[lut]
+    lut.setflags(write=False)
+    return lut
+
+
+def apply_lut(pixels, colormap=None):
+    min_value = int(np.amin(pixels))
+    max_value = int(np.amax(pixels))
+    lut = get_lut(min_value, max_value, colormap)
+    indices = np.subtract(pixels, min_value, dtype=np.intp)
+    return np.take(lut, indices, axis=0)
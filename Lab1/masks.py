@@ -0,0 +1,89 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+# Masks are boolean arrays keyed by image geometry; cached ones are read-only
+# so they can be shared between slices without copying.
+
+
+def _freeze(mask):
+    mask.setflags(write=False)
+    return mask
+
+
+@lru_cache(maxsize=64)
+def rectangle_mask(shape, top, left, bottom, right):
+    mask = np.zeros(shape, bool)
+    mask[max(top, 0):bottom, max(left, 0):right] = True
+    return _freeze(mask)
+
+
+@lru_cache(maxsize=64)
+def ellipse_mask(shape, center, radii):
+    rows, cols = np.ogrid[:shape[0], :shape[1]]
+    center_row, center_col = center
+    radius_row, radius_col = radii
+    mask = ((rows - center_row) / radius_row) ** 2 + ((cols - center_col) / radius_col) ** 2 <= 1.0
+    return _freeze(mask)
+
+
+# Even-odd rule over pixel centres; vertices are (row, col) pairs
+@lru_cache(maxsize=64)
+def polygon_mask(shape, vertices):
+    rows, cols = np.ogrid[:shape[0], :shape[1]]
+    mask = np.zeros(shape, bool)
+    for (row0, col0), (row1, col1) in zip(vertices, vertices[1:] + vertices[:1]):
+        if row0 == row1:
+            continue
+        spans = (row0 > rows) != (row1 > rows)
+        crossing = (col1 - col0) * (rows - row0) / (row1 - row0) + col0
+        mask ^= spans & (cols < crossing)
+    return _freeze(mask)
+
+
+def load_mask(path, shape):
+    mask = np.load(path)
+    if mask.shape != tuple(shape):
+        raise ValueError(f"Mask {path} has shape {mask.shape}, expected {tuple(shape)}")
+    return _freeze(mask.astype(bool))
+
+
+# Keeps the rows above the middle of the image (the original 'b' key mask)
+def half_mask(shape):
+    return rectangle_mask(shape, 0, 0, (shape[1] + 1) // 2, shape[1])
+
+
+def centered_ellipse_mask(shape):
+    return ellipse_mask(shape, ((shape[0] - 1) / 2, (shape[1] - 1) / 2), (shape[0] / 2, shape[1] / 2))
+
+
+PRESETS = {
+    'half': half_mask,
+    'ellipse': centered_ellipse_mask,
+}
+
+
+def get_mask(name, shape):
+    shape = tuple(shape)
+    if name in PRESETS:
+        return PRESETS[name](shape)
+    return load_mask(Path(name), shape)
+
+
+def compose(masks, mode='intersection'):
+    if mode == 'intersection':
+        return np.logical_and.reduce(masks)
+    if mode == 'union':
+        return np.logical_or.reduce(masks)
+    raise ValueError(f"Unknown mask composition mode: {mode}")
+
+
+# Zeroes everything outside the mask in place; a 2D mask broadcasts over slice stacks
+def apply_mask(pixels, mask):
+    np.multiply(pixels, mask, out=pixels)
+    return pixels
@@ -13,8 +13,14 @@ from OpenGL.GLU import *
 from OpenGL.GLUT import *
 from OpenGL.arrays.numpymodule import ARRAY_TO_GL_TYPE_MAPPING
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import equalization
+from probe import PixelProbe
+from voi import VoiLut
+
 MIN = -0.2
 MAX = 0.2
+PROBE_INTERVAL_MS = 33
 DEFAULT_IMAGE_PATH = (
     Path(__file__).resolve().parents[1]
     / "Images"
@@ -31,19 +37,32 @@ def load_texture(pixels, type):
     glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
 
 
+# Updates the bound texture in place instead of allocating a new one
+def update_texture(pixels):
+    gl_type = ARRAY_TO_GL_TYPE_MAPPING.get(pixels.dtype)
+    glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, width, height, GL_LUMINANCE, gl_type, pixels)
+
+
 def load_image(filename):
     global width, height, image, current_pixels, max_brightness, image_type
+    global voi, windowed_pixels, drag_start, drag_step
     image = pydicom.read_file(filename)
     width = image['0028', '0011'].value
     height = image['0028', '0010'].value
     current_pixels = image.pixel_array
     image_type = np.dtype('int' + str(image['0028', '0100'].value)) # int16
     max_brightness = np.iinfo(image_type).max # максимальное значение int16
+    voi = VoiLut(image_type)
+    windowed_pixels = np.empty(current_pixels.shape, image_type)
+    drag_start = None
+    min_max = min_max_pixels(current_pixels)
+    drag_step = max(float(min_max['max'] - min_max['min']) / width, 1.0)
 
 
 def init():
     global image
     load_texture(image.pixel_array, GL_LUMINANCE)
+    probe.set_pixels(current_pixels)
     glEnable(GL_TEXTURE_2D)
     glClearColor(0.0, 0.0, 0.0, 0.0)
 
@@ -61,10 +80,15 @@ def display():
     glTexCoord2f(1.0, 0.0)
     glVertex2f(height, 0.0)
     glEnd()
+    if probe_text:
+        draw_text(probe_text, 5, view_height - 15)
     glFlush()
 
 
 def reshape(w, h):
+    global view_width, view_height
+    view_width, view_height = w, h
+    glViewport(0, 0, w, h)
     glMatrixMode(GL_MODELVIEW)
     glLoadIdentity()
     gluOrtho2D(0.0, w, 0.0, h)
@@ -78,9 +102,12 @@ def keyboard(key, x, y):
         current_pixels = window_level_operation(np.array(image.pixel_array))
     elif key == b'e':
         current_pixels = equalize(np.array(image.pixel_array))
+    elif key == b'a':
+        current_pixels = adaptive_equalize(image.pixel_array)
     elif key == b'r':
         current_pixels = image.pixel_array
     load_texture(current_pixels, GL_LUMINANCE)
+    probe.set_pixels(current_pixels)
     display()
 
 
@@ -93,74 +120,95 @@ def draw_text(text, x, y):
     glEnable(GL_TEXTURE_2D)
 
 
-def motion(x, y):
+def mouse(button, state, x, y):
+    global drag_start
+    if button != GLUT_LEFT_BUTTON:
+        return
+    if state == GLUT_DOWN:
+        if voi.window is None:
+            voi.update(*window_level_preset(image.pixel_array))
+        drag_start = (x, y, voi.window, voi.level)
+    else:
+        drag_start = None
+
+
+# Horizontal drag changes the window, vertical drag changes the level
+def drag(x, y):
     global current_pixels
-    width = glutGet(GLUT_WINDOW_WIDTH)
-    height = glutGet(GLUT_WINDOW_HEIGHT)
-    if 0 < x < width and 0 < y < height:
-        text = "brightness: " + str(current_pixels[x][y])
+    if drag_start is None:
+        return
+    start_x, start_y, window, level = drag_start
+    if voi.update(window + (x - start_x) * drag_step, level - (y - start_y) * drag_step):
+        current_pixels = voi.apply(image.pixel_array, out=windowed_pixels)
+        update_texture(current_pixels)
+        probe.set_pixels(current_pixels)
         display()
-        draw_text(text, 5, height - 15)
-    else:
+
+
+# The quad spans [0, height] along x (columns) and [0, width] along y (rows)
+def window_to_image(x, y):
+    ortho_x = x * view_width / glutGet(GLUT_WINDOW_WIDTH)
+    ortho_y = (glutGet(GLUT_WINDOW_HEIGHT) - 1 - y) * view_height / glutGet(GLUT_WINDOW_HEIGHT)
+    return int(ortho_y * height / width), int(ortho_x * width / height)
+
+
+# Passive motion only records the cursor; the probe is redrawn at most once
+# per PROBE_INTERVAL_MS and only when its text changes
+def motion(x, y):
+    global probe_position, probe_scheduled
+    probe_position = (x, y)
+    if not probe_scheduled:
+        probe_scheduled = True
+        glutTimerFunc(PROBE_INTERVAL_MS, show_probe, 0)
+
+
+def show_probe(value):
+    global probe_scheduled, probe_text
+    probe_scheduled = False
+    row, column = window_to_image(*probe_position)
+    text = ""
+    if 0 <= row < height and 0 <= column < width:
+        text = "value: {value}  mean: {mean:.1f}  std: {std:.1f}  min: {min}  max: {max}".format(
+            **probe.stats(row, column)
+        )
+    if text != probe_text:
+        probe_text = text
         display()
-    glFlush()
 
 
 def min_max_pixels(pixels):
-    pixels_array = []
-    for row in pixels:
-        for pixel in row:
-            pixels_array.append(pixel)
-    return {'min': min(pixels_array), 'max': max(pixels_array)}
+    return {'min': np.amin(pixels), 'max': np.amax(pixels)}
 
 
-def window_level_operation(pixels):
-    new_pixels = []
+def window_level_preset(pixels):
     min_max = min_max_pixels(pixels)
     max_pixel = min_max['max'] * MAX
     min_pixel = min_max['min'] * MIN
     level = (max_pixel - min_pixel) / 2
     window = max_pixel - min_pixel
-    min_brightness = 0
-    for row in pixels:
-        new_row = []
-        for value in row:
-            if value <= level - window / 2:
-                new_value = min_brightness
-            elif value > level + window / 2:
-                new_value = max_brightness
-            else:
-                new_value = min_brightness + (value - level) * (max_brightness - min_brightness) / window
-
-            new_row.append(int(new_value))
-        new_pixels.append(new_row)
-    return np.array(new_pixels, image_type)
+    return window, level
+
+
+def window_level_operation(pixels):
+    voi.update(*window_level_preset(pixels))
+    return voi.apply(pixels, out=windowed_pixels)
 
 
 def equalize(pixels):
-    global max_brightness, image_type
-    max = max_brightness
-    min = 0
-    n = pixels.size
-    histogram = np.zeros(max)
-    for row in pixels:
-        for value in row:
-            histogram[value] = histogram[value] + 1
-    sum = 0
-    lut = np.zeros(n)
-    for i in range(0, max):
-        sum += histogram[i]
-        lut[i] = min + (sum * (max - min)) / n
-    result = []
-    for row in pixels:
-        new_row = []
-        for value in row:
-            new_row.append(lut[value])
-        result.append(new_row)
-    return np.array(result, image_type)
-
-
-def main(filename):
+    return equalization.equalize(pixels, image_type, max_brightness)
+
+
+def adaptive_equalize(pixels):
+    return equalization.clahe(pixels, image_type, max_brightness, clahe_tiles, clahe_clip_limit)
+
+
+def main(filename, tiles=(8, 8), clip_limit=2.0, probe_radius=2):
+    global clahe_tiles, clahe_clip_limit, probe, probe_text, probe_scheduled
+    clahe_tiles = tiles
+    clahe_clip_limit = clip_limit
+    probe = PixelProbe(probe_radius)
+    probe_text = ""
+    probe_scheduled = False
     glutInit(sys.argv)
     glutInitDisplayMode(GLUT_SINGLE | GLUT_RGB)
     load_image(filename)
@@ -172,6 +220,8 @@ def main(filename):
     glutReshapeFunc(reshape)
     glutKeyboardFunc(keyboard)
     glutPassiveMotionFunc(motion)
+    glutMouseFunc(mouse)
+    glutMotionFunc(drag)
     glutMainLoop()
 
 
@@ -183,9 +233,29 @@ def parse_args():
         default=DEFAULT_IMAGE_PATH,
         help="Path to the DICOM image.",
     )
+    parser.add_argument(
+        "--clahe-tiles",
+        type=int,
+        nargs=2,
+        default=(8, 8),
+        metavar=("ROWS", "COLS"),
+        help="Tile grid used by adaptive equalization on the 'a' key.",
+    )
+    parser.add_argument(
+        "--clahe-clip",
+        type=float,
+        default=2.0,
+        help="Adaptive equalization clip limit, as a multiple of the mean bin count.",
+    )
+    parser.add_argument(
+        "--probe-radius",
+        type=int,
+        default=2,
+        help="Radius of the ROI summarized by the mouse-hover probe.",
+    )
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = parse_args()
-    main(str(args.image))
+    main(str(args.image), tuple(args.clahe_tiles), args.clahe_clip, args.probe_radius)
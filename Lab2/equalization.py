@@ -0,0 +1,94 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+import numpy as np
+
+
+# Histogram over every value of the pixel type, indexed from the type minimum
+def histogram(pixels, dtype):
+    info = np.iinfo(dtype)
+    indices = np.subtract(pixels, info.min, dtype=np.intp)
+    return np.bincount(indices.ravel(), minlength=2 ** info.bits), indices
+
+
+def equalization_lut(hist, out_max):
+    cdf = np.cumsum(hist, dtype=np.float64)
+    if cdf[-1] == 0:
+        return cdf
+    return cdf * (out_max / cdf[-1])
+
+
+def equalize(pixels, dtype, out_max):
+    hist, indices = histogram(pixels, dtype)
+    lut = equalization_lut(hist, out_max).astype(dtype)
+    return lut[indices]
+
+
+def tile_edges(length, tiles):
+    return np.linspace(0, length, tiles + 1).astype(int)
+
+
+# Fractional tile coordinate of every pixel row/column, clamped to the outer
+# tile centres, split into the two neighbouring tiles and the blend weight
+def blend_axis(length, edges):
+    centers = (edges[:-1] + edges[1:] - 1) / 2
+    position = np.interp(np.arange(length), centers, np.arange(len(centers)))
+    first = np.floor(position).astype(np.intp)
+    second = np.minimum(first + 1, len(centers) - 1)
+    return first, second, (position - first).astype(np.float32)
+
+
+def clipped_tile_lut(bins, nbins, clip_limit, out_max):
+    hist = np.bincount(bins.ravel(), minlength=nbins).astype(np.float64)
+    limit = max(clip_limit * bins.size / nbins, 1.0)
+    clipped = np.minimum(hist, limit)
+    clipped += (hist.sum() - clipped.sum()) / nbins
+    return equalization_lut(clipped, out_max)
+
+
+# Contrast-limited adaptive equalization: one clipped LUT per tile, bilinear
+# blending between the four nearest tile LUTs. Tile rows are processed in
+# parallel, and the blend writes straight into the output array.
+def clahe(pixels, dtype, out_max, tiles=(8, 8), clip_limit=2.0, bins=4096, workers=None):
+    height, width = pixels.shape
+    # No more tiles than pixels along an axis, so every tile is non-empty
+    tiles = (min(tiles[0], height), min(tiles[1], width))
+    min_value = int(np.amin(pixels))
+    value_range = int(np.amax(pixels)) - min_value + 1
+    nbins = min(value_range, bins)
+    bin_indices = np.subtract(pixels, min_value, dtype=np.intp)
+    bin_indices *= nbins
+    bin_indices //= value_range
+
+    row_edges = tile_edges(height, tiles[0])
+    col_edges = tile_edges(width, tiles[1])
+    luts = np.empty((tiles[0], tiles[1], nbins), np.float32)
+
+    def build_row(i):
+        for j in range(tiles[1]):
+            tile = bin_indices[row_edges[i]:row_edges[i + 1], col_edges[j]:col_edges[j + 1]]
+            luts[i, j] = clipped_tile_lut(tile, nbins, clip_limit, out_max)
+
+    row0, row1, row_weight = blend_axis(height, row_edges)
+    col0, col1, col_weight = blend_axis(width, col_edges)
+    result = np.empty((height, width), dtype)
+
+    def blend_rows(i):
+        rows = slice(row_edges[i], row_edges[i + 1])
+        b = bin_indices[rows]
+        top0 = row0[rows, None]
+        top1 = row1[rows, None]
+        wy = row_weight[rows, None]
+        wx = col_weight[None, :]
+        upper = luts[top0, col0, b] * (1 - wx) + luts[top0, col1, b] * wx
+        lower = luts[top1, col0, b] * (1 - wx) + luts[top1, col1, b] * wx
+        result[rows] = upper * (1 - wy) + lower * wy
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        list(executor.map(build_row, range(tiles[0])))
+        list(executor.map(blend_rows, range(tiles[0])))
+    return result
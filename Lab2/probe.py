@@ -0,0 +1,57 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from common.integral import accumulator_type, box_sum, integral_image
+
+
+# Separable sliding min/max; edge padding only repeats values that already
+# lie inside the border-clipped window, so the result matches the clipped ROI
+def window_extremum(pixels, radius, reduce):
+    padded = np.pad(pixels, radius, mode='edge')
+    size = 2 * radius + 1
+    rows = reduce(sliding_window_view(padded, size, axis=1), axis=-1)
+    return reduce(sliding_window_view(rows, size, axis=0), axis=-1)
+
+
+# Statistics over a (2 * radius + 1)^2 ROI around a pixel. The tables are built
+# lazily on the first query after the displayed buffer changes, after which
+# every query is O(1).
+class PixelProbe:
+    def __init__(self, radius=2):
+        self.radius = radius
+        self.set_pixels(None)
+
+    def set_pixels(self, pixels):
+        self.pixels = pixels
+        self.sums = None
+        self.squares = None
+        self.minimum = None
+        self.maximum = None
+
+    def prepare(self):
+        if self.sums is None:
+            dtype = accumulator_type(self.pixels)
+            self.sums = integral_image(self.pixels, dtype)
+            self.squares = integral_image(np.square(self.pixels, dtype=dtype), dtype)
+            self.minimum = window_extremum(self.pixels, self.radius, np.min)
+            self.maximum = window_extremum(self.pixels, self.radius, np.max)
+
+    def stats(self, row, column):
+        self.prepare()
+        height, width = self.pixels.shape
+        top, bottom = max(row - self.radius, 0), min(row + self.radius + 1, height)
+        left, right = max(column - self.radius, 0), min(column + self.radius + 1, width)
+        count = (bottom - top) * (right - left)
+        mean = box_sum(self.sums, top, left, bottom, right) / count
+        variance = box_sum(self.squares, top, left, bottom, right) / count - mean ** 2
+        return {
+            'value': self.pixels[row, column],
+            'mean': mean,
+            'std': max(variance, 0.0) ** 0.5,
+            'min': self.minimum[row, column],
+            'max': self.maximum[row, column],
+        }
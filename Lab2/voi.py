@@ -0,0 +1,60 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+from math import ceil, floor
+
+import numpy as np
+
+
+# Linear VOI LUT over every value of a 16-bit (or narrower) integer type.
+# The table is stored in unsigned index order so signed pixels can be looked
+# up through a zero-copy view, and window/level changes only rewrite the part
+# of the table where the old and the new ramps differ.
+class VoiLut:
+    def __init__(self, dtype=np.int16, out_dtype=None, out_max=None):
+        self.dtype = np.dtype(dtype)
+        self.index_type = np.dtype('uint' + str(self.dtype.itemsize * 8))
+        self.out_dtype = np.dtype(out_dtype or self.dtype)
+        self.out_max = np.iinfo(self.out_dtype).max if out_max is None else out_max
+        self.size = 2 ** (self.dtype.itemsize * 8)
+        self.values = np.arange(self.size, dtype=self.index_type).view(self.dtype).astype(np.float32)
+        self.lut = np.zeros(self.size, self.out_dtype)
+        self.window = None
+        self.level = None
+        self.ramp = None
+
+    def segments(self, start, stop):
+        if self.dtype.kind == 'u':
+            return [slice(start, stop + 1)]
+        segments = []
+        if start < 0:
+            segments.append(slice(start + self.size, min(stop, -1) + self.size + 1))
+        if stop >= 0:
+            segments.append(slice(max(start, 0), stop + 1))
+        return segments
+
+    def update(self, window, level):
+        window = max(float(window), 1.0)
+        level = float(level)
+        if (window, level) == (self.window, self.level):
+            return False
+        low = level - window / 2
+        high = level + window / 2
+        info = np.iinfo(self.dtype)
+        if self.ramp is None:
+            start, stop = info.min, info.max
+        else:
+            start = max(floor(min(low, self.ramp[0])), info.min)
+            stop = min(ceil(max(high, self.ramp[1])), info.max)
+        scale = self.out_max / window
+        for indices in self.segments(start, stop):
+            ramp = (self.values[indices] - low) * scale
+            np.clip(ramp, 0, self.out_max, out=ramp)
+            self.lut[indices] = ramp
+        self.window, self.level, self.ramp = window, level, (low, high)
+        return True
+
+    def apply(self, pixels, out=None):
+        indices = np.asarray(pixels, self.dtype).view(self.index_type)
+        return np.take(self.lut, indices, out=out)
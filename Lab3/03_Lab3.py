@@ -13,6 +13,9 @@ from OpenGL.GLU import *
 from OpenGL.GLUT import *
 from OpenGL.arrays.numpymodule import ARRAY_TO_GL_TYPE_MAPPING
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from filter_bank import FilterBank
+
 DEFAULT_IMAGE_PATH = (
     Path(__file__).resolve().parents[1]
     / "Images"
@@ -40,62 +43,18 @@ masks = [
 ]
 
 
-def get_real(pixels, mask, i, j):
-    pixel_value = 0
-    for y in range(-1, 2):
-        for x in range(-1, 2):
-            pixel_value += mask[y + 1][x + 1] * pixels[i + y][j + x]
-    return pixel_value
-
-
-def get_extrapolation(pixels, mask, i, j):
-    global height, width
-    pixel_value = 0
-    for y in range(-1, 2):
-        for x in range(-1, 2):
-            if is_out_of_bounds(i + y, width - 1) or is_out_of_bounds(j + x, height - 1):
-                pixel_value += 0
-            else:
-                pixel_value += mask[y + 1][x + 1] * pixels[i + y][j + x]
-    return pixel_value
-
-
-def is_out_of_bounds(point, length):
-    return (point - 1 < 0) or (point + 1 > length)
-
-
-def filter(pixels, mask):
-    global height, width, max_brightness, image_type
-    result = []
-    for i, row in enumerate(pixels):
-        new_row = []
-        for j, pixel in enumerate(row):
-            if is_out_of_bounds(i, height - 1) or is_out_of_bounds(j, width - 1):  # якщо за межами зображення
-                pixel_value = get_extrapolation(pixels, mask, i, j)
-            else:
-                pixel_value = get_real(pixels, mask, i, j)
-            if pixel_value < 0:
-                pixel_value = 0
-            elif pixel_value > max_brightness:
-                pixel_value = max_brightness
-            new_row.append(pixel_value)
-        result.append(new_row)
-    return np.array(result, image_type)
-
-
 def keyboard(key, x, y):
     global image, current_pixels
     if key == chr(27).encode():
         sys.exit(0)
-    elif key == b'1':
-        current_pixels = filter(np.array(image.pixel_array), masks[0])
-    elif key == b'2':
-        current_pixels = filter(np.array(image.pixel_array), masks[1])
-    elif key == b'3':
-        current_pixels = filter(np.array(image.pixel_array), masks[2])
+    elif key in (b'1', b'2', b'3'):
+        index = int(key) - 1
+        source_key, responses = filter_bank.lookup(image.pixel_array)
+        current_pixels = responses[index]
+        glBindTexture(GL_TEXTURE_2D, filter_texture(source_key, responses, index))
     elif key == b'r':
         current_pixels = image.pixel_array
-    load_texture(current_pixels, GL_LUMINANCE)
+        glBindTexture(GL_TEXTURE_2D, source_texture)
     display()
     print('Done')
 
@@ -124,27 +83,47 @@ def display():
 
 def load_texture(pixels, type):
     gl_type = ARRAY_TO_GL_TYPE_MAPPING.get(pixels.dtype)
-    glBindTexture(GL_TEXTURE_2D, glGenTextures(1))
+    texture = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, texture)
     glTexImage2D(GL_TEXTURE_2D, 0, type, width, height, 0, type, gl_type, pixels)
     glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
     glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+    return texture
+
+
+# One texture per filter-bank response; all of them are dropped together when
+# the bank's key (from FilterBank.lookup) names a different source image
+def filter_texture(source_key, responses, index):
+    global filter_textures_key
+    if source_key != filter_textures_key:
+        if filter_textures:
+            glDeleteTextures(list(filter_textures.values()))
+        filter_textures.clear()
+        filter_textures_key = source_key
+    if index not in filter_textures:
+        filter_textures[index] = load_texture(responses[index], GL_LUMINANCE)
+    return filter_textures[index]
 
 
 def init():
-    global image
-    load_texture(image.pixel_array, GL_LUMINANCE)
+    global image, source_texture
+    source_texture = load_texture(image.pixel_array, GL_LUMINANCE)
     glEnable(GL_TEXTURE_2D)
     glClearColor(0.0, 0.0, 0.0, 0.0)
 
 
 def load_image(filename):
     global width, height, image, current_pixels, max_brightness, image_type
+    global filter_bank, filter_textures, filter_textures_key
     image = pydicom.read_file(filename)
     width = image['0028', '0011'].value
     height = image['0028', '0010'].value
     current_pixels = image.pixel_array
     image_type = np.dtype('int' + str(image['0028', '0100'].value))
     max_brightness = np.iinfo(image_type).max
+    filter_bank = FilterBank(masks, 'zero', limits=(0, max_brightness), out_dtype=image_type)
+    filter_textures = {}
+    filter_textures_key = None
 
 
 def main(filename):
@@ -0,0 +1,51 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+from collections import OrderedDict
+
+import numpy as np
+
+from common.cache import image_key
+from common.convolution import pad
+
+
+# Applies several same-sized masks in one pass: the source is padded once and
+# every shifted neighbourhood view is shared by all masks. Results are kept per
+# source image (keyed by content), so switching masks does not recompute.
+class FilterBank:
+    def __init__(self, masks, border='zero', dtype=np.float32, limits=None, out_dtype=None, max_images=2):
+        self.kernels = np.asarray(masks, dtype)
+        self.border = border
+        self.dtype = dtype
+        self.limits = limits
+        self.out_dtype = out_dtype or dtype
+        self.max_images = max_images
+        self.cache = OrderedDict()
+
+    def compute(self, pixels):
+        height, width = np.shape(pixels)
+        padded = pad(pixels, self.kernels.shape[1:], self.border, self.dtype)
+        result = np.zeros((len(self.kernels), height, width), self.dtype)
+        scratch = np.empty((height, width), self.dtype)
+        for dy, dx in np.ndindex(*self.kernels.shape[1:]):
+            view = padded[dy:dy + height, dx:dx + width]
+            for index in np.flatnonzero(self.kernels[:, dy, dx]):
+                np.multiply(view, self.kernels[index, dy, dx], out=scratch)
+                result[index] += scratch
+        if self.limits is not None:
+            np.clip(result, *self.limits, out=result)
+        return result.astype(self.out_dtype, copy=False)
+
+    def lookup(self, pixels):
+        key = image_key(pixels)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+        else:
+            self.cache[key] = self.compute(pixels)
+            while len(self.cache) > self.max_images:
+                self.cache.popitem(last=False)
+        return key, self.cache[key]
+
+    def responses(self, pixels):
+        return self.lookup(pixels)[1]
@@ -13,6 +13,12 @@ from OpenGL.GLU import *
 from OpenGL.GLUT import *
 from OpenGL.arrays.numpymodule import ARRAY_TO_GL_TYPE_MAPPING
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common import normalization
+from thresholding import METHODS, LocalThresholder
+
+# Клавіші для інших локальних методів (Niblack - клавіша 's')
+METHOD_KEYS = {b'v': 'sauvola', b'w': 'wolf', b'p': 'phansalkar'}
 DEFAULT_IMAGE_PATH = (
     Path(__file__).resolve().parents[1]
     / "Images"
@@ -51,17 +57,18 @@ def reshape(w, h):
 
 
 def load_image(filename):
-    global image, width, height, image_type, max_brightness
+    global image, width, height, image_type, max_brightness, thresholder
     image = pydicom.read_file(filename)
     width = image['0028', '0011'].value
     height = image['0028', '0010'].value
     image_type = np.dtype('int' + str(image['0028', '0100'].value))
     max_brightness = np.iinfo(image_type).max
+    thresholder = LocalThresholder(max_brightness)
 
 
 def init():
     global normalized_pixels
-    normalized_pixels = normalize(np.array(image.pixel_array))
+    normalized_pixels = normalize(image.pixel_array, normalization_mode)
     load_texture(normalized_pixels, GL_LUMINANCE)
     glEnable(GL_TEXTURE_2D)
     glClearColor(0.0, 0.0, 0.0, 0.0)
@@ -71,7 +78,11 @@ def keyboard(key, x, y):
     if key == chr(27).encode():
         sys.exit(0)
     elif key == b's':
-        new_pixels = niblack(normalized_pixels)
+        new_pixels = niblack(normalized_pixels, window_size, sensitivity)
+        load_texture(new_pixels, GL_LUMINANCE)
+        display()
+    elif key in METHOD_KEYS:
+        new_pixels = local_threshold(normalized_pixels, METHOD_KEYS[key], window_size)
         load_texture(new_pixels, GL_LUMINANCE)
         display()
     elif key == b'r':
@@ -79,60 +90,35 @@ def keyboard(key, x, y):
         display()
 
 
+# Локальна порогова обробка; статистики вікна спільні для всіх методів та k
+def local_threshold(pixels, method, w, k=None):
+    mask = thresholder.binarize(pixels, method, w, k)
+    return np.where(mask, max_brightness, 0).astype(image_type)
+
+
 # Алгоритм Ніблека (Niblack thresholding)
-def niblack(pixels):
-    w = 15  # ширина вікна
-    k = -0.2  # коефіцієнт чутливості
-    threshold_array = []
-    for i in range(pixels.shape[0]):
-        row = []
-        for j in range(pixels.shape[1]):
-            window = []
-            for y in range(-int(w / 2), int(w / 2) + 1):
-                for x in range(-int(w / 2), int(w / 2) + 1):
-                    point_i = i + y
-                    point_j = j + x
-                    if is_out_of_bounds(point_i, width - 1) or is_out_of_bounds(point_j, height - 1):
-                        window.append(0)
-                    else:
-                        window.append(pixels[point_i][point_j])
-            nu = np.mean(window)  # математичне сподівання (середнє значення)
-            sigma = np.std(window)  # стандартне відхилення
-            t = nu + k * sigma
-            row.append(t)
-        threshold_array.append(row)
-    threshold_array = np.asarray(threshold_array)
-    new_pixels = np.where(pixels <= threshold_array, 0, max_brightness)
-    return np.array(new_pixels, image_type)
-
-
-# Перевірка знаходження пікселя за межами зображення
-def is_out_of_bounds(point, length):
-    return (point - 1 < 0) or (point + 1 > length)
+# w - ширина вікна, k - коефіцієнт чутливості
+def niblack(pixels, w=15, k=-0.2):
+    return local_threshold(pixels, 'niblack', w, k)
+
+
+def run_batch(filename, output_dir, methods, windows, ks, mode='fraction'):
+    load_image(filename)
+    pixels = normalize(image.pixel_array, mode)
+    paths = thresholder.batch(pixels, methods, windows, ks, output_dir)
+    print(f"Wrote {len(paths)} masks to {output_dir}")
 
 
 # Нормалізація пікселів (щоб зображення було нормально видно)
-def normalize(pixels):
-    global max_peak
-    min_peak = int(float(np.amax(pixels)) * 0.25)
-    max_peak = int(float(np.amax(pixels)) * 0.85)
-    new_min = 0
-    new_max = max_brightness
-    result = []
-    for row in pixels:
-        new_row = []
-        for pixel in row:
-            new_pixel = ((pixel - min_peak) / (max_peak - min_peak)) * (new_max - new_min)
-            if new_pixel < 0:
-                new_pixel = 0
-            if new_pixel > new_max:
-                new_pixel = new_max
-            new_row.append(new_pixel)
-        result.append(new_row)
-    return np.array(result, image_type)
-
-
-def main(filename):
+def normalize(pixels, mode='fraction'):
+    return normalization.normalize(pixels, mode, image_type, max_brightness)
+
+
+def main(filename, w=15, k=-0.2, mode='fraction'):
+    global window_size, sensitivity, normalization_mode
+    normalization_mode = mode
+    window_size = w
+    sensitivity = k
     glutInit(sys.argv)
     glutInitDisplayMode(GLUT_SINGLE | GLUT_RGB)
     load_image(filename)
@@ -147,16 +133,63 @@ def main(filename):
 
 
 def parse_args():
-    parser = argparse.ArgumentParser(description="Run Lab 4 Niblack thresholding.")
+    parser = argparse.ArgumentParser(description="Run Lab 4 local adaptive thresholding.")
     parser.add_argument(
         "--image",
         type=Path,
         default=DEFAULT_IMAGE_PATH,
         help="Path to the DICOM image.",
     )
+    parser.add_argument(
+        "--normalization",
+        choices=normalization.MODES,
+        default="fraction",
+        help="Display normalization: fixed fractions of the maximum, robust percentiles or min/max.",
+    )
+    parser.add_argument(
+        "--window",
+        type=int,
+        default=15,
+        help="Niblack window size in pixels.",
+    )
+    parser.add_argument(
+        "-k",
+        type=float,
+        default=-0.2,
+        help="Niblack sensitivity coefficient.",
+    )
+    parser.add_argument(
+        "--batch-dir",
+        type=Path,
+        help="Write threshold masks for the parameter grid to this directory instead of opening a window.",
+    )
+    parser.add_argument(
+        "--methods",
+        nargs="+",
+        choices=sorted(METHODS),
+        default=sorted(METHODS),
+        help="Threshold methods included in the batch grid.",
+    )
+    parser.add_argument(
+        "--windows",
+        type=int,
+        nargs="+",
+        default=[15],
+        help="Window sizes included in the batch grid.",
+    )
+    parser.add_argument(
+        "--k-values",
+        type=float,
+        nargs="+",
+        default=[-0.2, 0.2, 0.5],
+        help="Sensitivity coefficients included in the batch grid.",
+    )
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = parse_args()
-    main(str(args.image))
+    if args.batch_dir:
+        run_batch(str(args.image), args.batch_dir, args.methods, args.windows, args.k_values, args.normalization)
+    else:
+        main(str(args.image), args.window, args.k, args.normalization)
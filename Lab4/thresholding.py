@@ -0,0 +1,98 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from common.cache import image_key
+from common.integral import local_statistics
+
+
+# Local mean/std maps for one (image, window) pair plus the global values some
+# methods need. Every method and every k value reuses the same instance.
+class LocalStatistics:
+    def __init__(self, pixels, window, dynamic_range):
+        self.mean, self.std = local_statistics(pixels, window)
+        self.min_value = float(np.amin(pixels))
+        self.max_std = float(np.amax(self.std)) or 1.0
+        self.dynamic_range = float(dynamic_range)
+
+
+def niblack(stats, k):
+    return stats.mean + k * stats.std
+
+
+def sauvola(stats, k):
+    return stats.mean * (1 + k * (stats.std / (stats.dynamic_range / 2) - 1))
+
+
+def wolf(stats, k):
+    return (1 - k) * stats.mean + k * stats.min_value + k * stats.std / stats.max_std * (stats.mean - stats.min_value)
+
+
+# Phansalkar works on intensities normalized to [0, 1]
+def phansalkar(stats, k, p=2.0, q=10.0):
+    mean = stats.mean / stats.dynamic_range
+    std = stats.std / stats.dynamic_range
+    return stats.dynamic_range * mean * (1 + p * np.exp(-q * mean) + k * (std / 0.5 - 1))
+
+
+# Method name -> (threshold function, default k)
+METHODS = {
+    'niblack': (niblack, -0.2),
+    'sauvola': (sauvola, 0.5),
+    'wolf': (wolf, 0.5),
+    'phansalkar': (phansalkar, 0.25),
+}
+
+
+def window_size(w):
+    return 2 * (w // 2) + 1
+
+
+class LocalThresholder:
+    def __init__(self, dynamic_range, max_entries=8):
+        self.dynamic_range = dynamic_range
+        self.max_entries = max_entries
+        self.cache = OrderedDict()
+
+    def statistics(self, pixels, window):
+        key = (image_key(pixels), window_size(window))
+        if key in self.cache:
+            self.cache.move_to_end(key)
+        else:
+            self.cache[key] = LocalStatistics(pixels, key[1], self.dynamic_range)
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+        return self.cache[key]
+
+    def threshold(self, pixels, method, window, k=None):
+        function, default_k = METHODS[method]
+        return function(self.statistics(pixels, window), default_k if k is None else k)
+
+    # Foreground mask: True where the pixel is above its local threshold
+    def binarize(self, pixels, method, window, k=None):
+        return pixels > self.threshold(pixels, method, window, k)
+
+    # One statistics pass, then one elementwise threshold per k value
+    def sweep(self, pixels, method, window, ks):
+        stats = self.statistics(pixels, window)
+        function = METHODS[method][0]
+        for k in ks:
+            yield k, pixels > function(stats, k)
+
+    # Writes one boolean .npy mask per (method, window, k) and returns the paths
+    def batch(self, pixels, methods, windows, ks, output_dir):
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for window in windows:
+            for method in methods:
+                for k, mask in self.sweep(pixels, method, window, ks):
+                    path = output_dir / f"{method}_w{window_size(window)}_k{k:g}.npy"
+                    np.save(path, mask)
+                    paths.append(path)
+        return paths
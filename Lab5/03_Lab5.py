@@ -13,6 +13,14 @@ from OpenGL.GLU import *
 from OpenGL.GLUT import *
 from OpenGL.arrays.numpymodule import ARRAY_TO_GL_TYPE_MAPPING
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common import normalization
+from common.convolution import convolve
+from common.gaussian import gaussian_filter
+from edges import log_edges, zero_crossings
+from pipeline import Pipeline, Stage
+
+SHAG_POROGA = 100
 DEFAULT_IMAGE_PATH = (
     Path(__file__).resolve().parents[1]
     / "Images"
@@ -40,7 +48,7 @@ def zagruzka_izobrajeni9(im9_fayla):
 
 def inicializaci9():
     global norm_pixeli
-    norm_pixeli = normalizaci9(np.array(izobrajeni3.pixel_array))
+    norm_pixeli = normalizaci9(izobrajeni3.pixel_array, rejim_normalizacii)
     zagruzka_texturi(norm_pixeli, GL_LUMINANCE)
     glEnable(GL_TEXTURE_2D)
     glClearColor(0.0, 0.0, 0.0, 0.0)
@@ -67,126 +75,97 @@ def izmeneni3(shirina, visota):
     gluOrtho2D(0.0, shirina, 0.0, visota)
 
 
-def normalizaci9(pixeli):
-    maximum = np.amax(pixeli)
-    min_peak = int(float(maximum) * 0.25)
-    max_peak = int(float(maximum) * 0.85)
-    noviy_min = 0
-    noviy_max = max_9rkost
-    resultat = []
-    for stroka in pixeli:
-        novaya_stroka = []
-        for pixel in stroka:
-            noviy_pixel = ((pixel - min_peak) / (max_peak - min_peak)) * (noviy_max - noviy_min)
-            if noviy_pixel < noviy_min:
-                noviy_pixel = noviy_min
-            if noviy_pixel > noviy_max:
-                noviy_pixel = noviy_max
-            novaya_stroka.append(noviy_pixel)
-        resultat.append(novaya_stroka)
-    return np.array(resultat, tip_izobrajeni9)
-
-
-def is_out_of_bounds(point, length):
-    return (point - 1 < 0) or (point + 1 > length)
-
-
-def get_real(pixeli, maska, i, j):
-    pixel = 0
-    for y in range(-1, 2):
-        for x in range(-1, 2):
-            pixel += maska[y + 1][x + 1] * pixeli[i + y][j + x]
-    return pixel
-
-
-def get_mirror(pixeli, maska, i, j):
-    pixel = 0
-    for y in range(-1, 2):
-        for x in range(-1, 2):
-            curr_i = i + y
-            curr_j = j + x
-            if is_out_of_bounds(curr_i, shirina - 1):
-                curr_i = i - y
-            if is_out_of_bounds(curr_j, visota - 1):
-                curr_j = j - x
-            pixel += maska[y + 1][x + 1] * pixeli[curr_i][curr_j]
-    return pixel
+def normalizaci9(pixeli, rejim='fraction'):
+    return normalization.normalize(pixeli, rejim, tip_izobrajeni9, max_9rkost)
+
+
+# Етапи: згладжування -> оператор Лапласа -> переходи через нуль
+def sozdanie_konveyera(obyem_kesha):
+    return Pipeline(
+        [
+            Stage('gauss', filtr_gaussa, sigma=sigma_gaussa),
+            Stage('laplace', operator_laplasa),
+            Stage('zero_crossings', detekciya_porogov, porog=porog_nahila),
+        ],
+        obyem_kesha,
+    )
+
+
+def pokaz_etapa(etap):
+    global curr_pixeli, tekushiy_etap
+    tekushiy_etap = etap
+    curr_pixeli = konveyer.run(norm_pixeli, etap)
+    glEnable(GL_TEXTURE_2D)
+    zagruzka_texturi(curr_pixeli, GL_LUMINANCE)
+    otobrajeni3()
 
 
 def najati3(key, x, y):
-    global curr_pixeli
+    global curr_pixeli, tekushiy_etap
     if key == chr(27).encode():
         sys.exit(0)
     elif key == b'r':
+        tekushiy_etap = None
         glEnable(GL_TEXTURE_2D)
         zagruzka_texturi(norm_pixeli, GL_LUMINANCE)
         otobrajeni3()
-    elif key == b'1':
-        curr_pixeli = filtr_gaussa(norm_pixeli)
-        glEnable(GL_TEXTURE_2D)
-        zagruzka_texturi(curr_pixeli, GL_LUMINANCE)
-        otobrajeni3()
-    elif key == b'2':
-        curr_pixeli = operator_laplasa(curr_pixeli)
-        glEnable(GL_TEXTURE_2D)
-        zagruzka_texturi(curr_pixeli, GL_LUMINANCE)
-        otobrajeni3()
-    elif key == b'3':
-        curr_pixeli = detekciya_porogov(curr_pixeli)
+    elif key in (b'1', b'2', b'3'):
+        pokaz_etapa(int(key) - 1)
+    elif key in (b'+', b'-'):
+        sigma = konveyer.params('gauss')['sigma'] * (1.25 if key == b'+' else 0.8)
+        konveyer.set_params('gauss', sigma=sigma)
+        print(f"sigma = {sigma:.3g}")
+        if tekushiy_etap is not None:
+            pokaz_etapa(tekushiy_etap)
+    elif key in (b'[', b']'):
+        porog = max(konveyer.params('zero_crossings')['porog'] + (SHAG_POROGA if key == b']' else -SHAG_POROGA), 0)
+        konveyer.set_params('zero_crossings', porog=porog)
+        print(f"porog = {porog:g}")
+        if tekushiy_etap is not None:
+            pokaz_etapa(tekushiy_etap)
+    elif key == b'4':
+        curr_pixeli = granici_log(norm_pixeli)
         glEnable(GL_TEXTURE_2D)
         zagruzka_texturi(curr_pixeli, GL_LUMINANCE)
         otobrajeni3()
 
 
-def filtr_gaussa(pixeli):
-    resultat = []
-    for i, stroka in enumerate(pixeli):
-        novaya_stroka = []
-        for j, pixel in enumerate(stroka):
-            if is_out_of_bounds(i, shirina - 1) or is_out_of_bounds(j, visota - 1):
-                pixel_value = get_mirror(pixeli, maska_gausa, i, j)
-            else:
-                pixel_value = get_real(pixeli, maska_gausa, i, j)
-            if pixel_value > max_9rkost:
-                pixel_value = max_9rkost
-            novaya_stroka.append(pixel_value)
-        resultat.append(novaya_stroka)
-    return np.array(resultat, tip_izobrajeni9)
+def ogranichenie(resultat):
+    np.clip(resultat, np.iinfo(tip_izobrajeni9).min, max_9rkost, out=resultat)
+    return resultat.astype(tip_izobrajeni9)
+
+
+def filtr_maskoy(pixeli, maska):
+    return ogranichenie(convolve(pixeli, maska, border='mirror'))
+
+
+def filtr_gaussa(pixeli, sigma=None):
+    return ogranichenie(gaussian_filter(pixeli, sigma_gaussa if sigma is None else sigma, border='mirror'))
 
 
 def operator_laplasa(pixeli):
-    resultat = []
-    for i, stroka in enumerate(pixeli):
-        novaya_stroka = []
-        for j, pixel in enumerate(stroka):
-            if is_out_of_bounds(i, shirina - 1) or is_out_of_bounds(j, visota - 1):
-                pixel_value = get_mirror(pixeli, maska_laplaca, i, j)
-            else:
-                pixel_value = get_real(pixeli, maska_laplaca, i, j)
-            if pixel_value > max_9rkost:
-                pixel_value = max_9rkost
-            novaya_stroka.append(pixel_value)
-        resultat.append(novaya_stroka)
-    return np.array(resultat, tip_izobrajeni9)
-
-
-def detekciya_porogov(pixeli):
-    resultat = np.zeros_like(pixeli)
-    for i in range(1, pixeli.shape[0] - 1):
-        for j in range(1, pixeli.shape[1] - 1):
-            if pixeli[i][j] == 0:
-                if (pixeli[i][j - 1] < 0 and pixeli[i][j + 1] > 0) or (
-                        pixeli[i][j - 1] < 0 and pixeli[i][j + 1] < 0) or (
-                        pixeli[i - 1][j] < 0 and pixeli[i + 1][j] > 0) or (
-                        pixeli[i - 1][j] > 0 and pixeli[i + 1][j] < 0):
-                    resultat[i][j] = max_9rkost
-            if pixeli[i][j] < 0:
-                if (pixeli[i][j - 1] > 0) or (pixeli[i][j + 1] > 0) or (pixeli[i - 1][j] > 0) or (pixeli[i + 1][j] > 0):
-                    resultat[i][j] = max_9rkost
-    return np.array(resultat, tip_izobrajeni9)
-
-
-def glavnaya_funkci9(filename):
+    return filtr_maskoy(pixeli, maska_laplaca)
+
+
+def detekciya_porogov(pixeli, porog=0.0):
+    return np.where(zero_crossings(pixeli, porog), max_9rkost, 0).astype(tip_izobrajeni9)
+
+
+# LoG: згладжування, оператор Лапласа та пошук переходів через нуль за один прохід;
+# sigma і поріг за замовчуванням беруться з конвеєра, тож клавіші +/- та [/] діють і тут
+def granici_log(pixeli, sigma=None, porog=None):
+    sigma = konveyer.params('gauss')['sigma'] if sigma is None else sigma
+    porog = konveyer.params('zero_crossings')['porog'] if porog is None else porog
+    return np.where(log_edges(pixeli, sigma, porog), max_9rkost, 0).astype(tip_izobrajeni9)
+
+
+def glavnaya_funkci9(filename, rejim='fraction', sigma=1.0, porog=0.0, obyem_kesha_mb=256):
+    global rejim_normalizacii, sigma_gaussa, porog_nahila, konveyer, tekushiy_etap
+    rejim_normalizacii = rejim
+    sigma_gaussa = sigma
+    porog_nahila = porog
+    konveyer = sozdanie_konveyera(obyem_kesha_mb * 2 ** 20)
+    tekushiy_etap = None
     glutInit(sys.argv)
     glutInitDisplayMode(GLUT_SINGLE | GLUT_RGB)
     zagruzka_izobrajeni9(filename)
@@ -200,8 +179,6 @@ def glavnaya_funkci9(filename):
     glutMainLoop()
 
 
-# maska_gausa = [[0.01, 0.09, 0.01], [0.09, 0.64, 0.09], [0.01, 0.09, 10.01]]
-maska_gausa = [[0.059, 0.097, 0.059], [0.097, 0.159, 0.097], [0.059, 0.097, 10.059]]
 # maska_laplaca = [[0, -1, 0], [-1, 4, -1], [0, -1, 0]]
 # maska_laplaca = [[-1, -1, -1], [-1, 8, -1], [-1, -1, -1]]
 # maska_laplaca = [[0, 1, 0], [1, -4, 1], [0, 1, 0]]
@@ -216,9 +193,33 @@ def parse_args():
         default=DEFAULT_IMAGE_PATH,
         help="Path to the DICOM image.",
     )
+    parser.add_argument(
+        "--normalization",
+        choices=normalization.MODES,
+        default="fraction",
+        help="Display normalization: fixed fractions of the maximum, robust percentiles or min/max.",
+    )
+    parser.add_argument(
+        "--sigma",
+        type=float,
+        default=1.0,
+        help="Sigma of the Gaussian smoothing on the '1' key and of the LoG edge detector on '4'.",
+    )
+    parser.add_argument(
+        "--edge-threshold",
+        type=float,
+        default=0.0,
+        help="Minimum jump across a zero crossing for the LoG edge detector (suppresses weak edges).",
+    )
+    parser.add_argument(
+        "--cache-mb",
+        type=float,
+        default=256,
+        help="Memory budget of the stage result cache in megabytes.",
+    )
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = parse_args()
-    glavnaya_funkci9(str(args.image))
+    glavnaya_funkci9(str(args.image), args.normalization, args.sigma, args.edge_threshold, args.cache_mb)
@@ -0,0 +1,56 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+# Times separable and FFT Gaussian smoothing over a range of sigmas and slice
+# sizes and reports the sigma where FFT becomes faster (compare with
+# common.gaussian.FFT_SIGMAS).
+
+import argparse
+from pathlib import Path
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.gaussian import fft_sigma, gaussian_fft, gaussian_separable
+
+DEFAULT_SIGMAS = [0.5, 1, 1.5, 2, 3, 4, 5, 6, 8, 12, 16]
+
+
+def best_time(function, pixels, sigma, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function(pixels, sigma)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def benchmark(size, sigmas, repeats):
+    pixels = np.random.default_rng(0).integers(0, 32767, (size, size)).astype(np.int16)
+    switch = None
+    print(f"{size}x{size}")
+    print(f"{'sigma':>8} {'separable ms':>14} {'fft ms':>10}")
+    for sigma in sigmas:
+        separable = best_time(gaussian_separable, pixels, sigma, repeats)
+        fft = best_time(gaussian_fft, pixels, sigma, repeats)
+        if switch is None and fft < separable:
+            switch = sigma
+        print(f"{sigma:>8g} {separable * 1000:>14.2f} {fft * 1000:>10.2f}")
+    print(f"FFT is faster from sigma = {switch} (gaussian_filter switches at {fft_sigma(pixels.shape)})\n")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark separable vs FFT Gaussian smoothing.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[256, 512], help="Slice sizes to test.")
+    parser.add_argument("--sigmas", type=float, nargs="+", default=DEFAULT_SIGMAS, help="Sigmas to test.")
+    parser.add_argument("--repeats", type=int, default=5, help="Runs per measurement (best is reported).")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    for size in args.sizes:
+        benchmark(size, args.sigmas, args.repeats)
@@ -0,0 +1,40 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+import numpy as np
+
+from common.gaussian import laplacian_of_gaussian
+
+
+# Zero crossings of a Laplacian response found by comparing the array with its
+# shifted copies along rows and columns. A crossing marks the negative pixel of
+# a negative/positive neighbour pair, or a zero pixel whose two neighbours have
+# opposite signs in either order, along rows as well as columns; the jump
+# across it must exceed `threshold` (edge slope).
+def zero_crossings(response, threshold=0.0):
+    response = np.asarray(response, np.float32)
+    edges = np.zeros(response.shape, bool)
+    for axis in (0, 1):
+        first = [slice(None)] * 2
+        second = [slice(None)] * 2
+        first[axis] = slice(None, -1)
+        second[axis] = slice(1, None)
+        a, b = response[tuple(first)], response[tuple(second)]
+        steep = np.abs(a - b) > threshold
+        edges[tuple(first)] |= (a < 0) & (b > 0) & steep
+        edges[tuple(second)] |= (b < 0) & (a > 0) & steep
+        before = [slice(None)] * 2
+        centre = [slice(None)] * 2
+        after = [slice(None)] * 2
+        before[axis] = slice(None, -2)
+        centre[axis] = slice(1, -1)
+        after[axis] = slice(2, None)
+        p, q = response[tuple(before)], response[tuple(after)]
+        edges[tuple(centre)] |= (response[tuple(centre)] == 0) & (p * q < 0) & (np.abs(p - q) > threshold)
+    return edges
+
+
+# Smoothing, Laplacian and zero-crossing detection as one operation
+def log_edges(pixels, sigma, threshold=0.0, border='mirror'):
+    return zero_crossings(laplacian_of_gaussian(pixels, sigma, border), threshold)
@@ -0,0 +1,59 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+import hashlib
+
+from common.cache import LruCache, image_key
+
+
+class Stage:
+    def __init__(self, name, function, **params):
+        self.name = name
+        self.function = function
+        self.params = params
+
+    def key(self, input_key):
+        text = repr((input_key, self.name, sorted(self.params.items())))
+        return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+    def __call__(self, pixels):
+        return self.function(pixels, **self.params)
+
+
+# Chain of stages whose outputs are memoized by a key built from the stage's
+# input key and its parameters. Changing a parameter changes the keys of that
+# stage and every later one, so only those are recomputed; earlier results
+# come from the cache.
+class Pipeline:
+    def __init__(self, stages, max_bytes=256 * 2 ** 20):
+        self.stages = list(stages)
+        self.cache = LruCache(max_bytes)
+
+    def index(self, stage):
+        if isinstance(stage, int):
+            return stage
+        return [s.name for s in self.stages].index(stage)
+
+    def set_params(self, stage, **params):
+        self.stages[self.index(stage)].params.update(params)
+
+    def params(self, stage):
+        return dict(self.stages[self.index(stage)].params)
+
+    # Output of `stage` (name or index; the last stage by default)
+    def run(self, pixels, stage=-1):
+        last = self.index(stage) % len(self.stages)
+        key = image_key(pixels)
+        keys = []
+        for s in self.stages[:last + 1]:
+            key = s.key(key)
+            keys.append(key)
+        start = last
+        while start >= 0 and keys[start] not in self.cache:
+            start -= 1
+        result = pixels if start < 0 else self.cache.get(keys[start])
+        for i in range(start + 1, last + 1):
+            result = self.stages[i](result)
+            self.cache.put(keys[i], result)
+        return result
@@ -5,7 +5,6 @@
 import argparse
 from pathlib import Path
 import sys
-from math import radians, cos, sin
 
 import numpy as np
 import pydicom
@@ -14,12 +13,18 @@ from OpenGL.GLU import *
 from OpenGL.GLUT import *
 from OpenGL.arrays.numpymodule import ARRAY_TO_GL_TYPE_MAPPING
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common import normalization
+from resampling import INTERPOLATIONS, AffineResampler
+from transforms import lab_stack, load_parameters
+
 DEFAULT_IMAGE_PATH = (
     Path(__file__).resolve().parents[1]
     / "Images"
     / "ImageForLab2-6"
     / "DICOM_Image_16b.dcm"
 )
+DEFAULT_OUTPUT_PATH = Path("lab6_transformed.npy")
 
 
 def zagruzka_texturi(pixeli, tip):
@@ -41,7 +46,7 @@ def zagruzka_izobrajeni9(im9_fayla):
 
 def inicializaci9():
     global norm_pixeli
-    norm_pixeli = normalizaci9(np.array(izobrajeni3.pixel_array))
+    norm_pixeli = normalizaci9(izobrajeni3.pixel_array, rejim_normalizacii)
     zagruzka_texturi(norm_pixeli, GL_LUMINANCE)
     glEnable(GL_TEXTURE_2D)
     glClearColor(0.0, 0.0, 0.0, 0.0)
@@ -68,26 +73,26 @@ def izmeneni3(shirina, visota):
     glLoadIdentity()
     gluOrtho2D(-shirina // 2, shirina // 2, -visota // 2, visota // 2)
     defoltnaya_matrica = glGetFloatv(GL_MODELVIEW_MATRIX)
+    glMultMatrixf(stek.matrix)
+
+
+def normalizaci9(pixeli, rejim='fraction'):
+    return normalization.normalize(pixeli, rejim, tip_izobrajeni9, max_9rkost)
+
 
+# Same result as the GL transform, computed on the CPU and saved as .npy
+def sohranenie_rezultata():
+    rezultat = resampler.apply(norm_pixeli, stek.matrix, rejim_interpolacii)
+    np.save(put_rezultata, rezultat)
+    print(f"Saved {put_rezultata}")
 
-def normalizaci9(pixeli):
-    maximum = np.amax(pixeli)
-    min_peak = int(float(maximum) * 0.25)
-    max_peak = int(float(maximum) * 0.85)
-    noviy_min = 0
-    noviy_max = max_9rkost
-    resultat = []
-    for stroka in pixeli:
-        novaya_stroka = []
-        for pixel in stroka:
-            noviy_pixel = ((pixel - min_peak) / (max_peak - min_peak)) * (noviy_max - noviy_min)
-            if noviy_pixel < noviy_min:
-                noviy_pixel = noviy_min
-            if noviy_pixel > noviy_max:
-                noviy_pixel = noviy_max
-            novaya_stroka.append(noviy_pixel)
-        resultat.append(novaya_stroka)
-    return np.array(resultat, tip_izobrajeni9)
+
+# The GL matrix is always rebuilt from the default one and the composed
+# matrix of the stack, so repeated key presses do not accumulate drift
+def primenenie_matrici():
+    glLoadMatrixf(defoltnaya_matrica)
+    glMultMatrixf(stek.matrix)
+    otobrajeni3()
 
 
 def najati3(key, x, y):
@@ -97,17 +102,37 @@ def najati3(key, x, y):
     elif key == b'r':
         glEnable(GL_TEXTURE_2D)
         zagruzka_texturi(norm_pixeli, GL_LUMINANCE)
-        glLoadMatrixf(defoltnaya_matrica)
-        otobrajeni3()
+        stek.reset()
+        primenenie_matrici()
     elif key == b'1':
-        glMultMatrixf(pervaya_matrica @ vtoraya_matrica)
-        otobrajeni3()
+        stek.push('1')
+        primenenie_matrici()
     elif key == b'2':
-        glMultMatrixf(np.linalg.inv(pervaya_matrica @ vtoraya_matrica))
-        otobrajeni3()
-
-
-def glavnaya_funkci9(filename):
+        stek.push('-1')
+        primenenie_matrici()
+    elif key == b'z':
+        stek.undo()
+        primenenie_matrici()
+    elif key == b'y':
+        stek.redo()
+        primenenie_matrici()
+    elif key == b's':
+        sohranenie_rezultata()
+
+
+def glavnaya_funkci9(filename, transformacii, rejim='fraction', interpolaci9='bilinear', put=DEFAULT_OUTPUT_PATH, paket=False):
+    global rejim_normalizacii, rejim_interpolacii, put_rezultata, resampler, stek, norm_pixeli
+    rejim_normalizacii = rejim
+    rejim_interpolacii = interpolaci9
+    put_rezultata = put
+    resampler = AffineResampler()
+    stek = transformacii
+    if paket:
+        # No window: apply the replayed sequence on the CPU and save it
+        zagruzka_izobrajeni9(filename)
+        norm_pixeli = normalizaci9(izobrajeni3.pixel_array, rejim_normalizacii)
+        sohranenie_rezultata()
+        return
     glutInit(sys.argv)
     glutInitDisplayMode(GLUT_SINGLE | GLUT_RGB)
     zagruzka_izobrajeni9(filename)
@@ -129,31 +154,62 @@ def parse_args():
         default=DEFAULT_IMAGE_PATH,
         help="Path to the DICOM image.",
     )
+    parser.add_argument(
+        "--normalization",
+        choices=normalization.MODES,
+        default="fraction",
+        help="Display normalization: fixed fractions of the maximum, robust percentiles or min/max.",
+    )
+    parser.add_argument(
+        "--shear",
+        type=float,
+        nargs=2,
+        default=[0.0, 0.0],
+        metavar=("X", "Y"),
+        help="Shear vector of the first transformation.",
+    )
+    parser.add_argument(
+        "--angle",
+        type=float,
+        default=15.0,
+        help="Rotation angle (degrees) of the second transformation.",
+    )
+    parser.add_argument(
+        "--transforms",
+        type=Path,
+        help='JSON file with "shear", "angle" and "sequence"; overrides the flags above.',
+    )
+    parser.add_argument(
+        "--sequence",
+        nargs="+",
+        default=[],
+        help="Steps applied at startup: 1 for the transformation, -1 for its inverse.",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Apply the sequence, save it to --output and exit without opening a window.",
+    )
+    parser.add_argument(
+        "--interpolation",
+        choices=INTERPOLATIONS,
+        default="bilinear",
+        help="Interpolation used when the transformed image is saved with the s key.",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=DEFAULT_OUTPUT_PATH,
+        help="Where the s key saves the transformed image (.npy).",
+    )
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = parse_args()
-    dict = {}
-    dict['xvec'] = float(input("Vvedite vektor x dl9 pervoy transormacii: "))
-    dict['yvec'] = float(input("Vvedite vektor y dl9 pervoy transormacii: "))
-    dict['x'] = int(input("Vvedite vektor x dl9 vtoroy transormacii: "))
-    dict['y'] = int(input("Vvedite vektor y dl9 pervoy transormacii: "))
-    dict['alpha'] = float(input("Vvedite ugol x dl9 vtoroy transormacii: "))
-
-    pervaya_matrica = np.array(
-        [[1, 0, dict['xvec'], 0], [0, 1, dict['yvec'], 0], [0, 0, 1, 0], [0, 0, 0, 1]],
-        dtype=float,
-    ).transpose()
-
-    vtoraya_matrica = np.array(
-        [
-            [cos(radians(dict['alpha'])), sin(radians(dict['alpha'])), 0, 0],
-            [-sin(radians(dict['alpha'])), cos(radians(dict['alpha'])), 0, 0],
-            [0, 0, 1, 0],
-            [0, 0, 0, 1],
-        ],
-        dtype=float,
-    ).transpose()
-
-    glavnaya_funkci9(str(args.image))
+    sdvig, ugol, posledovatelnost = args.shear, args.angle, args.sequence
+    if args.transforms:
+        sdvig, ugol, posledovatelnost = load_parameters(args.transforms, sdvig, ugol, posledovatelnost)
+    stek = lab_stack(sdvig, ugol)
+    stek.replay(posledovatelnost)
+    glavnaya_funkci9(str(args.image), stek, args.normalization, args.interpolation, args.output, args.batch)
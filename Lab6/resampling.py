@@ -0,0 +1,112 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+from collections import OrderedDict
+
+import numpy as np
+
+INTERPOLATIONS = ('nearest', 'bilinear', 'cubic')
+PAD = 2
+
+
+# 4x4 matrices here are in the column-major layout passed to glMultMatrixf; the
+# quad lies in the z = 0 plane, so only the x, y and w rows/columns matter
+def gl_to_affine(matrix):
+    math_matrix = np.asarray(matrix, np.float64).reshape(4, 4).T
+    return math_matrix[np.ix_([0, 1, 3], [0, 1, 3])]
+
+
+# Pixel (column, row) -> quad coordinates used by the lab's display(): the
+# quad is centred on the origin, texture t (rows) runs against x and texture
+# s (columns) against y, and it spans the image width along both axes
+def pixel_frame(shape):
+    height, width = shape
+    scale = width / height
+    return np.array([[0.0, -scale, (height / 2 - 0.5) * scale], [-1.0, 0.0, width / 2 - 0.5], [0.0, 0.0, 1.0]])
+
+
+# Keys cubic convolution weights (a = -0.5) for taps at offsets -1, 0, 1, 2
+def cubic_weights(t):
+    a = -0.5
+    distances = np.stack([1 + t, t, 1 - t, 2 - t])
+    near = ((a + 2) * distances - (a + 3)) * distances ** 2 + 1
+    far = ((a * distances - 5 * a) * distances + 8 * a) * distances - 4 * a
+    return np.where(distances <= 1, near, far)
+
+
+# Resamples images as they would appear after glMultMatrixf(matrix). For every
+# output pixel the source position is found by inverse mapping; the resulting
+# tap indices and weights are cached per (matrix, shape, interpolation) and
+# applied to a single slice or a whole (n, height, width) stack at once.
+class AffineResampler:
+    def __init__(self, max_grids=16):
+        self.max_grids = max_grids
+        self.grids = OrderedDict()
+
+    def source_coordinates(self, matrix, shape):
+        frame = pixel_frame(shape)
+        inverse = np.linalg.inv(np.linalg.inv(frame) @ gl_to_affine(matrix) @ frame)
+        rows, columns = np.indices(shape, dtype=np.float64)
+        points = np.stack([columns.ravel(), rows.ravel(), np.ones(rows.size)])
+        source = inverse @ points
+        source_columns = (source[0] / source[2]).reshape(shape)
+        source_rows = (source[1] / source[2]).reshape(shape)
+        return source_rows, source_columns
+
+    def build_grid(self, matrix, shape, interpolation):
+        rows, columns = self.source_coordinates(matrix, shape)
+        if interpolation == 'nearest':
+            offsets = np.array([0])
+            base_rows, base_columns = np.floor(rows + 0.5), np.floor(columns + 0.5)
+            row_weights = column_weights = np.ones((1,) + shape, np.float32)
+        elif interpolation == 'bilinear':
+            offsets = np.array([0, 1])
+            base_rows, base_columns = np.floor(rows), np.floor(columns)
+            t, u = rows - base_rows, columns - base_columns
+            row_weights = np.stack([1 - t, t]).astype(np.float32)
+            column_weights = np.stack([1 - u, u]).astype(np.float32)
+        elif interpolation == 'cubic':
+            offsets = np.array([-1, 0, 1, 2])
+            base_rows, base_columns = np.floor(rows), np.floor(columns)
+            row_weights = cubic_weights(rows - base_rows).astype(np.float32)
+            column_weights = cubic_weights(columns - base_columns).astype(np.float32)
+        else:
+            raise ValueError(f"Unknown interpolation: {interpolation}")
+        # Indices into the image padded with PAD zeros on every side; anything
+        # further outside is clipped onto that zero border
+        limits = (shape[0] + 2 * PAD - 1, shape[1] + 2 * PAD - 1)
+        row_indices = np.clip(base_rows[np.newaxis] + offsets[:, None, None] + PAD, 0, limits[0]).astype(np.intp)
+        column_indices = np.clip(base_columns[np.newaxis] + offsets[:, None, None] + PAD, 0, limits[1]).astype(np.intp)
+        taps = []
+        for i in range(len(offsets)):
+            for j in range(len(offsets)):
+                flat = row_indices[i] * (limits[1] + 1) + column_indices[j]
+                taps.append((flat.ravel(), (row_weights[i] * column_weights[j]).ravel()))
+        return taps
+
+    def grid(self, matrix, shape, interpolation):
+        key = (np.asarray(matrix, np.float64).tobytes(), tuple(shape), interpolation)
+        if key in self.grids:
+            self.grids.move_to_end(key)
+        else:
+            self.grids[key] = self.build_grid(matrix, tuple(shape), interpolation)
+            while len(self.grids) > self.max_grids:
+                self.grids.popitem(last=False)
+        return self.grids[key]
+
+    def apply(self, pixels, matrix, interpolation='bilinear'):
+        pixels = np.asarray(pixels)
+        stack = pixels if pixels.ndim == 3 else pixels[np.newaxis]
+        taps = self.grid(matrix, stack.shape[1:], interpolation)
+        padded = np.pad(stack.astype(np.float32, copy=False), ((0, 0), (PAD, PAD), (PAD, PAD)))
+        padded = padded.reshape(len(stack), -1)
+        result = np.zeros((len(stack), stack.shape[1] * stack.shape[2]), np.float32)
+        for indices, weights in taps:
+            result += np.take(padded, indices, axis=1) * weights
+        result = result.reshape(stack.shape)
+        if pixels.dtype.kind in 'iu':
+            info = np.iinfo(pixels.dtype)
+            np.clip(np.rint(result, out=result), info.min, info.max, out=result)
+        result = result.astype(pixels.dtype, copy=False)
+        return result if pixels.ndim == 3 else result[0]
@@ -0,0 +1,110 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+import json
+from math import cos, radians, sin
+
+import numpy as np
+
+# Matrices are kept in the layout passed to glMultMatrixf (transposed)
+
+
+def shear_matrix(x, y):
+    return np.array([[1, 0, x, 0], [0, 1, y, 0], [0, 0, 1, 0], [0, 0, 0, 1]], dtype=float).transpose()
+
+
+def rotation_matrix(alpha):
+    c, s = cos(radians(alpha)), sin(radians(alpha))
+    return np.array([[c, s, 0, 0], [-s, c, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]], dtype=float).transpose()
+
+
+# One named transform; its inverse is computed once, when the step is created
+class Step:
+    def __init__(self, name, matrix, inverse=None):
+        self.name = name
+        self.matrix = np.asarray(matrix, dtype=float)
+        self.inverse = np.linalg.inv(self.matrix) if inverse is None else inverse
+
+    def inverted(self):
+        return Step('-' + self.name, self.inverse, self.matrix)
+
+
+# Named steps (and their inverses under '-name') composed onto one matrix.
+# composed[i] holds the product of the first i steps together with its
+# inverse, so undo/redo only move along this list: nothing is inverted and
+# nothing is re-multiplied after the step itself is created.
+class TransformStack:
+    def __init__(self, steps=()):
+        self.steps = {}
+        for step in steps:
+            self.add(step)
+        self.applied = []
+        self.undone = []
+        self.composed = [(np.identity(4), np.identity(4))]
+
+    def add(self, step):
+        self.steps[step.name] = step
+        self.steps['-' + step.name] = step.inverted()
+
+    @property
+    def matrix(self):
+        return self.composed[-1][0]
+
+    @property
+    def inverse(self):
+        return self.composed[-1][1]
+
+    def names(self):
+        return [step.name for step in self.applied]
+
+    def push(self, name, clear_redo=True):
+        if name not in self.steps:
+            raise ValueError(f"Unknown transform step: {name}")
+        step = self.steps[name]
+        matrix, inverse = self.composed[-1]
+        self.applied.append(step)
+        self.composed.append((step.matrix @ matrix, inverse @ step.inverse))
+        if clear_redo:
+            self.undone.clear()
+        return self.matrix
+
+    def undo(self):
+        if self.applied:
+            self.undone.append(self.applied.pop())
+            self.composed.pop()
+        return self.matrix
+
+    def redo(self):
+        if self.undone:
+            self.push(self.undone.pop().name, clear_redo=False)
+        return self.matrix
+
+    def reset(self):
+        self.applied.clear()
+        self.undone.clear()
+        del self.composed[1:]
+        return self.matrix
+
+    def replay(self, names):
+        for name in names:
+            self.push(name)
+        return self.matrix
+
+
+# Lab6 parameters: the '1' step is shear(x, y) followed by a rotation by
+# `angle` degrees, exactly as the lab composes pervaya_matrica @ vtoraya_matrica
+def lab_stack(shear=(0.0, 0.0), angle=0.0):
+    return TransformStack([Step('1', shear_matrix(*shear) @ rotation_matrix(angle))])
+
+
+# {"shear": [x, y], "angle": a, "sequence": ["1", "1", "-1"]}; missing keys
+# fall back to the given defaults, and steps may also be JSON numbers
+def load_parameters(path, shear=(0.0, 0.0), angle=0.0, sequence=()):
+    with open(path) as file:
+        parameters = json.load(file)
+    return (
+        tuple(parameters.get('shear', shear)),
+        float(parameters.get('angle', angle)),
+        [str(step) for step in parameters.get('sequence', sequence)],
+    )
@@ -8,20 +8,32 @@ import sys
 from math import radians, cos, sin
 
 import numpy as np
-import pydicom
 from OpenGL.GL import *
 from OpenGL.GLUT import *
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from isotropic import resample_volume
+from marching_cubes import decimate, marching_cubes, save_mesh
+from mpr import MprVolume, texture_rows
+from projection import MODES, ProjectionRenderer
+from reslice import ObliqueReslicer
+from segmentation import component_statistics, label_colors, label_components, label_palette, region_grow
+from series import load_series, print_progress, series_paths
+from slice_store import SliceStore, index_series
+from textures import ImageTexture, PlaneTextures
+from volume_cache import DEFAULT_CACHE_DIR, VolumeCache
+
 DEFAULT_IMAGE_DIR = Path(__file__).resolve().parents[1] / "Images" / "ImagesForLab7"
+# Degrees per key press when tilting the oblique plane
+SHAG_UGLA = 5
+# Largest connected components listed after labeling
+CHISLO_KOMPONENT = 5
 
 
-def zagruzka_texturi():
-    glTexImage2D(GL_TEXTURE_2D, 0, GL_LUMINANCE, visota, shirina, 0, GL_LUMINANCE, GL_UNSIGNED_BYTE, image_pixels[t1])
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP)
-    glEnable(GL_TEXTURE_2D)
+# The three orthogonal planes through (t1, t3, t2), each textured by
+# teksturi_ploskostey.bind(plane, index)
+def ploskosti(teksturi_ploskostey):
+    teksturi_ploskostey.bind('axial', t1)
     glBegin(GL_QUADS)
     glTexCoord2f(0, 0)
     glVertex3f(0, 0, t1 * (slice_thickness + space_between_slices) / visota)
@@ -32,41 +44,152 @@ def zagruzka_texturi():
     glTexCoord2f(0, 1)
     glVertex3f(0, 1, t1 * (slice_thickness + space_between_slices) / visota)
     glEnd()
-    glTexImage2D(GL_TEXTURE_2D, 0, GL_LUMINANCE, visota, 32, 0, GL_LUMINANCE, GL_UNSIGNED_BYTE, sag_pixels[t2])
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP)
+    if lenivaya_zagruzka:
+        # A coronal or sagittal plane needs a row of every slice in the series
+        return
+    teksturi_ploskostey.bind('sagittal', t2)
     glBegin(GL_QUADS)
     glTexCoord2f(0, 0)
     glVertex3f(t2 / visota, 0, 0)
     glTexCoord2f(1, 0)
     glVertex3f(t2 / visota, 1, 0)
-    glTexCoord2f(1, n / 32)
+    glTexCoord2f(1, n / mpr.rows)
     glVertex3f(t2 / visota, 1, n * (slice_thickness + space_between_slices) / visota)
-    glTexCoord2f(0, n / 32)
+    glTexCoord2f(0, n / mpr.rows)
     glVertex3f(t2 / visota, 0, n * (slice_thickness + space_between_slices) / visota)
     glEnd()
-    glTexImage2D(GL_TEXTURE_2D, 0, GL_LUMINANCE, shirina, 32, 0, GL_LUMINANCE, GL_UNSIGNED_BYTE, front_pixels[t3])
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP)
+    teksturi_ploskostey.bind('coronal', t3)
     glBegin(GL_QUADS)
     glTexCoord2f(0, 0)
     glVertex3f(0, t3 / visota, 0)
     glTexCoord2f(1, 0)
     glVertex3f(1, t3 / visota, 0)
-    glTexCoord2f(1, n / 32)
+    glTexCoord2f(1, n / mpr.rows)
     glVertex3f(1, t3 / visota, n * (slice_thickness + space_between_slices) / visota)
-    glTexCoord2f(0, n / 32)
+    glTexCoord2f(0, n / mpr.rows)
     glVertex3f(0, t3 / visota, n * (slice_thickness + space_between_slices) / visota)
     glEnd()
+
+
+def zagruzka_texturi():
+    glEnable(GL_TEXTURE_2D)
+    ploskosti(teksturi)
+    if nalozhenie is not None:
+        # Label colours blended over the planes just drawn at the same depth
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glDepthFunc(GL_LEQUAL)
+        ploskosti(nalozhenie)
+        glDepthFunc(GL_LESS)
+        glDisable(GL_BLEND)
+    if pokaz_naklonnoy:
+        naklonnaya_ploskost()
     glDisable(GL_TEXTURE_2D)
+    if pokaz_poverhnosti:
+        poverhnost()
     glFlush()
 
 
+# Isosurface at --iso-level, extracted on first use; the full mesh is kept
+# for export and a decimated copy is drawn
+def izvlechenie_poverhnosti():
+    global setka, setka_pokaza
+    if setka is None:
+        setka = marching_cubes(image_pixels, uroven_poverhnosti, (slice_thickness + space_between_slices, 1.0, 1.0))
+        vershini, grani, normali = decimate(setka[0], setka[1], yacheyka_setki) if yacheyka_setki > 0 else setka
+        setka_pokaza = (vershini.astype(np.float32), grani.astype(np.uint32), normali.astype(np.float32))
+        print(f"Isosurface: {len(setka[1])} triangles, {len(grani)} drawn")
+    return setka
+
+
+def poverhnost():
+    vershini, grani, normali = setka_pokaza
+    glPushMatrix()
+    # Mesh units are pixels; the scene spans the image width/height as 1
+    glScalef(1 / shirina, 1 / visota, 1 / visota)
+    glEnable(GL_LIGHTING)
+    glEnable(GL_LIGHT0)
+    glEnable(GL_NORMALIZE)
+    glEnable(GL_COLOR_MATERIAL)
+    glColor3f(0.9, 0.8, 0.7)
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glEnableClientState(GL_NORMAL_ARRAY)
+    glVertexPointer(3, GL_FLOAT, 0, vershini)
+    glNormalPointer(GL_FLOAT, 0, normali)
+    glDrawElements(GL_TRIANGLES, grani.size, GL_UNSIGNED_INT, grani)
+    glDisableClientState(GL_NORMAL_ARRAY)
+    glDisableClientState(GL_VERTEX_ARRAY)
+    glDisable(GL_COLOR_MATERIAL)
+    glDisable(GL_NORMALIZE)
+    glDisable(GL_LIGHTING)
+    glPopMatrix()
+
+
+# Shows a label volume (0 = background) as a coloured overlay on the planes;
+# None removes the overlay
+def pokaz_metok(metki):
+    global nalozhenie
+    if nalozhenie is not None:
+        nalozhenie.delete()
+    nalozhenie = None
+    if metki is not None:
+        nalozhenie = PlaneTextures(MprVolume(metki), lambda pixeli: label_colors(pixeli, palitra))
+
+
+# Region grown from the voxel where the three planes meet
+def vyrashchivanie_oblasti():
+    oblast = region_grow(image_pixels, (t1, t3, t2), dopusk)
+    print(f"Region from ({t1}, {t3}, {t2}), tolerance {dopusk:g}: {np.count_nonzero(oblast)} voxels")
+    pokaz_metok(oblast.view(np.uint8))
+
+
+# Connected components of the voxels at or above --iso-level
+def komponenti():
+    metki, kolichestvo = label_components(image_pixels >= uroven_poverhnosti)
+    razmeri, nachala, konci = component_statistics(metki, kolichestvo)
+    print(f"{kolichestvo} components at level {uroven_poverhnosti:g}")
+    for i in np.argsort(razmeri)[::-1][:CHISLO_KOMPONENT]:
+        (z0, y0, x0), (z1, y1, x1) = nachala[i], konci[i]
+        print(f"  label {i + 1}: {razmeri[i]} voxels, z {z0}-{z1}, y {y0}-{y1}, x {x0}-{x1}")
+    pokaz_metok(metki)
+
+
+# Voxel (z, y, x) -> scene coordinates used by the plane quads above
+def v_scenu(voksel):
+    z, y, x = voksel
+    return x / shirina, y / visota, z * (slice_thickness + space_between_slices) / visota
+
+
+def obnovlenie_naklonnoy():
+    if rejim_proekcii:
+        srez = proektor.render(normal, rejim_proekcii)
+    else:
+        srez = reslicer.sample(tochka, normal)
+    naklonnaya_tekstura.update(np.rint(srez).astype(np.uint8))
+
+
+def naklonnaya_ploskost():
+    naklonnaya_tekstura.bind()
+    glBegin(GL_QUADS)
+    for (s, t), vershina in zip(((0, 0), (1, 0), (1, 1), (0, 1)), reslicer.corners(tochka, normal)):
+        glTexCoord2f(s, t)
+        glVertex3f(*v_scenu(vershina))
+    glEnd()
+
+
+# Rotates a (z, y, x) vector about one of the axes (0 = z, 1 = y, 2 = x)
+def povorot(vektor, os, gradusi):
+    a, b = [i for i in range(3) if i != os]
+    c, s = cos(radians(gradusi)), sin(radians(gradusi))
+    noviy = np.array(vektor, dtype=float)
+    noviy[a], noviy[b] = c * vektor[a] - s * vektor[b], s * vektor[a] + c * vektor[b]
+    return noviy
+
+
 def inicializaci9():
+    global teksturi, naklonnaya_tekstura
+    teksturi = PlaneTextures(mpr)
+    naklonnaya_tekstura = ImageTexture()
     glClearColor(0, 0, 0, 0.0)
     glMatrixMode(GL_PROJECTION)
     glLoadIdentity()
@@ -122,7 +245,7 @@ def transformaciya(ugol):
 
 
 def najati3(key, x, y):
-    global t1, t2, t3, ugol
+    global t1, t2, t3, ugol, pokaz_naklonnoy, tochka, normal, rejim_proekcii, pokaz_poverhnosti
     if key == chr(27).encode():
         sys.exit(0)
     if key == b't':
@@ -134,8 +257,14 @@ def najati3(key, x, y):
         glMultMatrixf(M)
     elif key == b'w' and t1 < n - 1:
         t1 += 1
+        if lenivaya_zagruzka:
+            image_pixels.prefetch(range(t1 + 1, t1 + 1 + predzagruzka))
     elif key == b's' and t1 > 0:
         t1 -= 1
+        if lenivaya_zagruzka:
+            image_pixels.prefetch(range(t1 - 1, t1 - 1 - predzagruzka, -1))
+    elif key in (b'd', b'a', b'z', b'c') and lenivaya_zagruzka:
+        print("Coronal and sagittal planes are not shown with --lazy")
     elif key == b'd' and t2 < shirina - 1:
         t2 += 1
     elif key == b'a' and t2 > 0:
@@ -144,6 +273,35 @@ def najati3(key, x, y):
         t3 += 1
     elif key == b'c' and t3 > 0:
         t3 -= 1
+    elif key in (b'o', b'p', b'm', b'g', b'f') and reslicer is None:
+        print("Oblique planes, projections, isosurfaces and segmentation need the whole volume; run without --lazy")
+    elif key == b'g':
+        vyrashchivanie_oblasti()
+    elif key == b'f':
+        komponenti()
+    elif key == b'x':
+        pokaz_metok(None)
+    elif key == b'm':
+        izvlechenie_poverhnosti()
+        pokaz_poverhnosti = not pokaz_poverhnosti
+    elif key == b'o':
+        pokaz_naklonnoy = not pokaz_naklonnoy
+    elif key == b'p':
+        # Oblique slice -> MIP -> MinIP -> average -> composite -> slice
+        rejimi = (None,) + MODES
+        rejim_proekcii = rejimi[(rejimi.index(rejim_proekcii) + 1) % len(rejimi)]
+        pokaz_naklonnoy = True
+        print(f"Oblique plane shows: {rejim_proekcii or 'slice'}")
+    elif key in (b'i', b'k'):
+        normal = povorot(normal, 2, SHAG_UGLA if key == b'i' else -SHAG_UGLA)
+    elif key in (b'j', b'l'):
+        normal = povorot(normal, 1, SHAG_UGLA if key == b'j' else -SHAG_UGLA)
+    elif key in (b'+', b'-'):
+        # One in-plane pixel along the normal, in voxel units
+        sdvig = normal / reslicer.spacing * reslicer.spacing[2]
+        tochka = tochka + (sdvig if key == b'+' else -sdvig)
+    if pokaz_naklonnoy and key in (b'o', b'p', b'i', b'k', b'j', b'l', b'+', b'-'):
+        obnovlenie_naklonnoy()
     otobrajeni3()
 
 
@@ -170,41 +328,180 @@ def parse_args():
     parser.add_argument(
         "--slices",
         type=int,
+        help="Number of slices to load (default: 20, or every slice in the directory with --lazy).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Threads used to decode slices (default: one per CPU, 1 reads serially).",
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Print the load time of every slice.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=DEFAULT_CACHE_DIR,
+        help="Directory for the preprocessed volume cache.",
+    )
+    parser.add_argument(
+        "--cache-mb",
+        type=float,
+        default=2048,
+        help="Size limit of the volume cache in MB.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always read the DICOM files and do not write the volume cache.",
+    )
+    parser.add_argument(
+        "--lazy",
+        action="store_true",
+        help="Index the directory by DICOM headers and decode slices only when they are shown.",
+    )
+    parser.add_argument(
+        "--slice-cache-mb",
+        type=float,
+        default=256,
+        help="Memory for decoded slices in --lazy mode, in MB.",
+    )
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=4,
+        help="Slices decoded ahead in the scroll direction in --lazy mode.",
+    )
+    parser.add_argument(
+        "--isotropic",
+        action="store_true",
+        help="Resample the volume to cubic voxels before display.",
+    )
+    parser.add_argument(
+        "--target-spacing",
+        type=float,
+        help="Voxel size for --isotropic, in pixels (default: the in-plane pixel size, 1).",
+    )
+    parser.add_argument(
+        "--iso-level",
+        type=float,
+        default=100,
+        help="Intensity (0-255) of the isosurface shown with the m key.",
+    )
+    parser.add_argument(
+        "--mesh-cell",
+        type=float,
+        default=2.0,
+        help="Cell size in pixels for decimating the displayed isosurface (0 keeps every triangle).",
+    )
+    parser.add_argument(
+        "--grow-tolerance",
+        type=float,
         default=20,
-        help="Number of slices to load.",
+        help="Intensity range (+/-) around the seed value for region growing with the g key.",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--export-mesh",
+        type=Path,
+        help="Extract the isosurface at startup and save it as .stl or .ply.",
+    )
+    args = parser.parse_args()
+    if args.slices is None and not args.lazy:
+        args.slices = 20
+    if args.lazy and (args.isotropic or args.export_mesh):
+        parser.error("--isotropic and --export-mesh need the whole volume and cannot be combined with --lazy")
+    return args
+
+
+# Whole volume in memory: from the cache or decoded in parallel
+def zagruzka_obyema(args):
+    paths = series_paths(args.image_dir, args.slices)
+    kesh = None if args.no_cache else VolumeCache(args.cache_dir, int(args.cache_mb * 2 ** 20))
+    zapis = kesh.load(paths) if kesh else None
+    if zapis is not None:
+        print(f"Using cached volume from {kesh.directory}")
+        return zapis
+    obyem, spacing, timings = load_series(paths, normalizaci9, workers=args.workers, progress=print_progress)
+    if args.timings:
+        for i, seconds in enumerate(timings):
+            print(f"slice {i + 1:4d}: {seconds * 1000:8.2f} ms")
+    print(f"Slice load time: mean {timings.mean() * 1000:.2f} ms, max {timings.max() * 1000:.2f} ms")
+    if kesh:
+        kesh.store(paths, obyem, spacing)
+    return obyem, spacing
+
+
+# Volume with cubic voxels; the slice step (thickness + gap) is in pixel units
+# as in the scene, and the result is kept in the volume cache under its own
+# variant, next to the normalized volume
+def izotropniy_obyem(args, obyem, spacing):
+    paths = series_paths(args.image_dir, args.slices)
+    variant = f"isotropic:{args.target_spacing or 1.0:g}"
+    kesh = None if args.no_cache else VolumeCache(args.cache_dir, int(args.cache_mb * 2 ** 20))
+    zapis = kesh.load(paths, variant) if kesh else None
+    if zapis is not None:
+        return zapis[0]
+    rezultat = resample_volume(obyem, (spacing[0] + spacing[1], 1.0, 1.0), args.target_spacing or 1.0)
+    if kesh:
+        try:
+            kesh.store(paths, rezultat, (args.target_spacing or 1.0,) * 3, variant)
+        except OSError as error:
+            print(f"Resampled volume not cached: {error}")
+    return rezultat
 
 
 def main():
     global n, shirina, visota
-    global image_pixels, front_pixels, sag_pixels
+    global image_pixels, mpr, reslicer, proektor
+    global pokaz_naklonnoy, tochka, normal, rejim_proekcii
     global slice_thickness, space_between_slices
+    global lenivaya_zagruzka, predzagruzka
+    global pokaz_poverhnosti, uroven_poverhnosti, yacheyka_setki, setka, setka_pokaza
+    global nalozhenie, palitra, dopusk
     global t1, t2, t3
 
     args = parse_args()
-    n = args.slices
-    shirina, visota = 256, 256
-    image_pixels = np.zeros((n, visota, shirina))
-    front_pixels = np.zeros((visota, n + 12, shirina))
-    sag_pixels = np.zeros((shirina, n + 12, visota))
-
-    for i in range(n):
-        filename = args.image_dir / f"brain_{i + 1:03d}.dcm"
-        dcm = pydicom.read_file(str(filename))
-        slice_thickness = dcm['0018', '0050'].value
-        space_between_slices = dcm['0018', '0088'].value
-        image_pixels[i] = normalizaci9(dcm.pixel_array)
-
-    for i in range(visota):
-        for j in range(n):
-            for k in range(shirina):
-                front_pixels[i][j][k] = image_pixels[j][i][k]
-
-    for i in range(shirina):
-        for j in range(n):
-            for k in range(visota):
-                sag_pixels[i][j][k] = image_pixels[j][k][i]
+    lenivaya_zagruzka = args.lazy
+    predzagruzka = args.prefetch
+    if lenivaya_zagruzka:
+        image_pixels = SliceStore(
+            index_series(args.image_dir)[:args.slices], normalizaci9, max_bytes=int(args.slice_cache_mb * 2 ** 20)
+        )
+        slice_thickness, space_between_slices = image_pixels.spacing
+    else:
+        image_pixels, (slice_thickness, space_between_slices) = zagruzka_obyema(args)
+    if args.isotropic:
+        image_pixels = izotropniy_obyem(args, image_pixels, (slice_thickness, space_between_slices))
+        # One voxel per slice step from here on
+        slice_thickness, space_between_slices = 1.0, 0.0
+    n, visota, shirina = image_pixels.shape
+    mpr = MprVolume(image_pixels)
+    reslicer = proektor = tochka = None
+    if not lenivaya_zagruzka:
+        reslicer = ObliqueReslicer(
+            image_pixels,
+            (slice_thickness + space_between_slices, 1.0, 1.0),
+            size=texture_rows(max(visota, shirina)),
+            workers=args.workers,
+        )
+        proektor = ProjectionRenderer(reslicer, workers=args.workers)
+        # The oblique plane starts as the axial plane through the volume centre
+        tochka = reslicer.center()
+    pokaz_naklonnoy = False
+    rejim_proekcii = None
+    normal = np.array([1.0, 0.0, 0.0])
+    pokaz_poverhnosti = False
+    uroven_poverhnosti, yacheyka_setki = args.iso_level, args.mesh_cell
+    setka = setka_pokaza = None
+    nalozhenie = None
+    palitra = label_palette()
+    dopusk = args.grow_tolerance
+    if args.export_mesh:
+        vershini, grani, normali = izvlechenie_poverhnosti()
+        save_mesh(args.export_mesh, vershini, grani, normali)
+        print(f"Saved {args.export_mesh}")
 
     t1, t2, t3 = 0, 0, 0
     glavnaya_funkci9()
@@ -0,0 +1,77 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+import numpy as np
+
+# Upper bound for the float32 temporaries of one chunk
+CHUNK_BYTES = 64 * 2 ** 20
+
+
+def resampled_length(length, spacing, target):
+    return int(np.floor((length - 1) * spacing / target + 1e-9)) + 1
+
+
+# Linear interpolation weights for sampling `length` points every
+# target / spacing input steps
+def axis_weights(length, spacing, target):
+    positions = np.arange(resampled_length(length, spacing, target)) * (target / spacing)
+    lower = np.clip(np.floor(positions), 0, max(length - 2, 0)).astype(np.intp)
+    fraction = (positions - lower).astype(np.float32)
+    upper = np.minimum(lower + 1, length - 1)
+    return lower, upper, fraction
+
+
+# Resamples one axis of `volume` to the target spacing with 1D linear
+# interpolation, writing into `out` (allocated when not given) chunk by
+# chunk along another axis so the temporaries stay below CHUNK_BYTES
+def resample_axis(volume, axis, spacing, target, out=None, dtype=None):
+    dtype = np.dtype(dtype or volume.dtype)
+    lower, upper, fraction = axis_weights(volume.shape[axis], spacing, target)
+    shape = list(volume.shape)
+    shape[axis] = len(lower)
+    out = np.empty(shape, dtype) if out is None else out
+    chunk_axis = 1 if axis == 0 else 0
+    plane_bytes = 4 * np.prod(shape) // shape[chunk_axis]
+    step = max(int(CHUNK_BYTES // (3 * plane_bytes)), 1)
+    weight_shape = [1] * volume.ndim
+    weight_shape[axis] = len(fraction)
+    fraction = fraction.reshape(weight_shape)
+    for start in range(0, shape[chunk_axis], step):
+        window = [slice(None)] * volume.ndim
+        window[chunk_axis] = slice(start, start + step)
+        chunk = volume[tuple(window)]
+        first = np.take(chunk, lower, axis=axis).astype(np.float32)
+        second = np.take(chunk, upper, axis=axis).astype(np.float32)
+        second -= first
+        second *= fraction
+        first += second
+        if dtype.kind in 'iu':
+            np.rint(first, out=first)
+        out[tuple(window)] = first
+    return out
+
+
+# Resamples an (n, height, width) volume with voxel size `spacing` (z, y, x)
+# to `target` spacing on every axis (the smallest input spacing when not
+# given), one separable pass per axis that actually changes. `out` may be
+# a preallocated array (e.g. a memory-mapped .npy) of the final shape.
+def resample_volume(volume, spacing, target=None, out=None):
+    spacing = [float(value) for value in spacing]
+    target = min(spacing) if target is None else float(target)
+    axes = [axis for axis in range(3) if abs(spacing[axis] - target) > 1e-9]
+    result = volume
+    for number, axis in enumerate(axes):
+        last = number == len(axes) - 1
+        result = resample_axis(result, axis, spacing[axis], target, out if last else None, volume.dtype)
+    if not axes:
+        if out is None:
+            return np.array(volume)
+        out[...] = volume
+        return out
+    return result
+
+
+def resampled_shape(shape, spacing, target=None):
+    target = min(spacing) if target is None else target
+    return tuple(resampled_length(length, step, target) for length, step in zip(shape, spacing))
@@ -0,0 +1,256 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import os
+
+import numpy as np
+
+# Cube corner i sits at offset (x, y, z) = (i & 1, i >> 1 & 1, i >> 2 & 1);
+# bit i of a cube's case is set when that corner is inside (value >= level)
+CORNERS = np.array([[i & 1, i >> 1 & 1, i >> 2 & 1] for i in range(8)])
+# Edge = (lower corner, upper corner, axis 0/1/2 for x/y/z)
+EDGES = [(a, a | 1 << axis, axis) for axis in range(3) for a in range(8) if not a >> axis & 1]
+
+
+def edge_index(a, b):
+    a, b = min(a, b), max(a, b)
+    for index, (lower, upper, _) in enumerate(EDGES):
+        if (lower, upper) == (a, b):
+            return index
+    raise ValueError(f"Corners {a} and {b} do not share an edge")
+
+
+# The four corners of each face in cyclic order
+def cube_faces():
+    result = []
+    for axis in range(3):
+        p, q = [other for other in range(3) if other != axis]
+        for side in (0, 1):
+            result.append([side << axis | i << p | j << q for i, j in ((0, 0), (1, 0), (1, 1), (0, 1))])
+    return result
+
+
+# Surface segments on one face. On an ambiguous face (inside corners on a
+# diagonal) each inside corner is cut off separately; the rule only looks
+# at the face itself, so the two cubes sharing it always agree and the
+# surface has no cracks.
+def face_segments(corners, inside):
+    segments = []
+    crossings = [edge_index(corners[i], corners[(i + 1) % 4]) for i in range(4)
+                 if inside[corners[i]] != inside[corners[(i + 1) % 4]]]
+    if len(crossings) == 2:
+        segments.append(tuple(crossings))
+    elif len(crossings) == 4:
+        for k in range(4):
+            if inside[corners[k]]:
+                segments.append((edge_index(corners[k - 1], corners[k]), edge_index(corners[k], corners[(k + 1) % 4])))
+    return segments
+
+
+# Triangles for one cube case: face segments are chained into closed
+# polygons, each oriented so its normal points from the inside corners to the
+# outside ones, and split into a triangle fan
+def case_triangles(case):
+    inside = [bool(case >> i & 1) for i in range(8)]
+    neighbours = {}
+    for corners in cube_faces():
+        for a, b in face_segments(corners, inside):
+            neighbours.setdefault(a, []).append(b)
+            neighbours.setdefault(b, []).append(a)
+    triangles = []
+    visited = set()
+    for start in sorted(neighbours):
+        if start in visited:
+            continue
+        polygon = [start]
+        visited.add(start)
+        previous, current = None, start
+        while True:
+            following = [edge for edge in neighbours[current] if edge != previous]
+            nxt = following[0] if previous is not None or len(following) == 1 else min(following)
+            if nxt == start:
+                break
+            polygon.append(nxt)
+            visited.add(nxt)
+            previous, current = current, nxt
+        points = np.array([(CORNERS[EDGES[e][0]] + CORNERS[EDGES[e][1]]) / 2 for e in polygon])
+        normal = np.zeros(3)
+        for i in range(len(points)):
+            normal += np.cross(points[i], points[(i + 1) % len(points)])
+        outward = np.zeros(3)
+        for e in polygon:
+            lower, upper, _ = EDGES[e]
+            outward += (CORNERS[upper] - CORNERS[lower]) * (1 if inside[lower] else -1)
+        if np.dot(normal, outward) < 0:
+            polygon.reverse()
+        triangles.extend((polygon[0], polygon[i], polygon[i + 1]) for i in range(1, len(polygon) - 1))
+    return triangles
+
+
+# (256, max triangles, 3) edge table padded with -1 plus triangle counts
+@lru_cache(maxsize=1)
+def triangle_table():
+    cases = [case_triangles(case) for case in range(256)]
+    table = np.full((256, max(len(case) for case in cases), 3), -1, np.int8)
+    for case, triangles in enumerate(cases):
+        if triangles:
+            table[case, :len(triangles)] = triangles
+    return table, np.array([len(case) for case in cases], np.int64)
+
+
+# Edge endpoints as (z, y, x) corner offsets and the global edge axis
+# (0 = z, 1 = y, 2 = x) used for edge keys
+EDGE_OFFSETS = np.array([CORNERS[lower][::-1] for lower, _, _ in EDGES])
+EDGE_AXES = np.array([2 - axis for _, _, axis in EDGES])
+AXIS_STEPS = np.eye(3, dtype=np.int64)
+
+
+# Triangles of the cubes whose lower corner lies in slices [start, stop) as
+# global edge keys (axis * volume.size + flat index of the lower endpoint),
+# so blocks sharing a boundary produce the same keys for the same vertex
+def block_triangles(volume, level, start, stop):
+    table, counts = triangle_table()
+    n, height, width = volume.shape
+    values = volume[start:stop + 1]
+    inside = values >= level
+    case = np.zeros((stop - start, height - 1, width - 1), np.uint8)
+    for bit, (x, y, z) in enumerate(CORNERS):
+        case |= inside[z:z + stop - start, y:y + height - 1, x:x + width - 1].astype(np.uint8) << bit
+    cubes = np.flatnonzero(counts[case.ravel()])
+    if not len(cubes):
+        return np.empty((0, 3), np.int64)
+    cases = case.ravel()[cubes]
+    z, y, x = np.unravel_index(cubes, case.shape)
+    z = z + start
+    repeats = counts[cases]
+    cube = np.repeat(np.arange(len(cubes)), repeats)
+    first = np.cumsum(repeats) - repeats
+    triangle = np.arange(len(cube)) - np.repeat(first, repeats)
+    edges = table[cases[cube], triangle].astype(np.intp)
+    offsets = EDGE_OFFSETS[edges]
+    flat = ((z[cube, None] + offsets[..., 0]) * height + y[cube, None] + offsets[..., 1]) * width + x[cube, None] + offsets[..., 2]
+    return EDGE_AXES[edges] * volume.size + flat
+
+
+# Positions (z, y, x) of the vertices on the given edge keys, by linear
+# interpolation of the level between the edge's two voxels
+def edge_vertices(volume, level, keys):
+    axes, flat = np.divmod(keys, volume.size)
+    lower = np.stack(np.unravel_index(flat, volume.shape), axis=1)
+    upper = lower + AXIS_STEPS[axes]
+    first = volume[tuple(lower.T)].astype(np.float64)
+    second = volume[tuple(upper.T)].astype(np.float64)
+    t = (level - first) / (second - first)
+    return lower + AXIS_STEPS[axes] * t[:, None]
+
+
+# Indexed triangle mesh of the `level` isosurface of an (n, height, width)
+# volume. Slabs of slices are processed on a thread pool; their triangles
+# refer to vertices by global edge key, and one np.unique over the keys
+# merges the vertices shared across slab boundaries. Returns vertices in
+# (x, y, z) scaled by spacing (z, y, x), triangles as vertex indices and
+# unit vertex normals pointing out of the region above the level.
+def marching_cubes(volume, level, spacing=(1.0, 1.0, 1.0), workers=None, block=32):
+    volume = np.asarray(volume)
+    n = volume.shape[0]
+    ranges = [(start, min(start + block, n - 1)) for start in range(0, n - 1, block)]
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(ranges) > 1:
+        with ThreadPoolExecutor(workers) as executor:
+            blocks = list(executor.map(lambda bounds: block_triangles(volume, level, *bounds), ranges))
+    else:
+        blocks = [block_triangles(volume, level, *bounds) for bounds in ranges]
+    keys = np.concatenate(blocks) if blocks else np.empty((0, 3), np.int64)
+    unique, faces = np.unique(keys, return_inverse=True)
+    faces = faces.reshape(-1, 3)
+    vertices = edge_vertices(volume, level, unique) * np.asarray(spacing, np.float64)
+    vertices = vertices[:, ::-1].copy()
+    return vertices, faces, vertex_normals(vertices, faces)
+
+
+def face_normals(vertices, faces):
+    first, second, third = (vertices[faces[:, i]] for i in range(3))
+    return np.cross(second - first, third - first)
+
+
+# Area-weighted average of the adjacent face normals
+def vertex_normals(vertices, faces):
+    normals = np.zeros_like(vertices)
+    weighted = face_normals(vertices, faces)
+    for i in range(3):
+        np.add.at(normals, faces[:, i], weighted)
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return normals / np.where(lengths > 0, lengths, 1)
+
+
+# Vertex clustering: vertices in the same cube of side `cell` are merged into
+# their mean, and triangles that collapse or repeat are dropped
+def decimate(vertices, faces, cell):
+    if cell <= 0 or not len(faces):
+        return vertices, faces, vertex_normals(vertices, faces)
+    cells = np.floor(vertices / cell).astype(np.int64)
+    cells -= cells.min(axis=0)
+    extent = cells.max(axis=0) + 1
+    keys = (cells[:, 0] * extent[1] + cells[:, 1]) * extent[2] + cells[:, 2]
+    _, cluster, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    merged = np.zeros((len(counts), 3))
+    np.add.at(merged, cluster, vertices)
+    merged /= counts[:, None]
+    faces = cluster[faces]
+    keep = (faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 0] != faces[:, 2])
+    faces = faces[keep]
+    # The same triangle in either winding counts as a repeat
+    order = np.sort(faces, axis=1)
+    _, first = np.unique(order, axis=0, return_index=True)
+    faces = faces[np.sort(first)]
+    used, faces = np.unique(faces, return_inverse=True)
+    faces = faces.reshape(-1, 3)
+    merged = merged[used]
+    return merged, faces, vertex_normals(merged, faces)
+
+
+def save_stl(path, vertices, faces):
+    normals = face_normals(vertices, faces)
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    record = np.dtype([('normal', '<f4', 3), ('vertices', '<f4', (3, 3)), ('attribute', '<u2')])
+    data = np.zeros(len(faces), record)
+    data['normal'] = normals / np.where(lengths > 0, lengths, 1)
+    data['vertices'] = vertices[faces]
+    with open(path, "wb") as file:
+        file.write(b"Lab7 isosurface".ljust(80, b" "))
+        file.write(np.uint32(len(faces)).tobytes())
+        file.write(data.tobytes())
+
+
+def save_ply(path, vertices, faces, normals=None):
+    normals = vertex_normals(vertices, faces) if normals is None else normals
+    header = (
+        "ply\nformat binary_little_endian 1.0\n"
+        f"element vertex {len(vertices)}\n"
+        "property float x\nproperty float y\nproperty float z\n"
+        "property float nx\nproperty float ny\nproperty float nz\n"
+        f"element face {len(faces)}\n"
+        "property list uchar int vertex_indices\nend_header\n"
+    )
+    points = np.hstack([vertices, normals]).astype('<f4')
+    record = np.dtype([('count', 'u1'), ('indices', '<i4', 3)])
+    triangles = np.zeros(len(faces), record)
+    triangles['count'] = 3
+    triangles['indices'] = faces
+    with open(path, "wb") as file:
+        file.write(header.encode("ascii"))
+        file.write(points.tobytes())
+        file.write(triangles.tobytes())
+
+
+def save_mesh(path, vertices, faces, normals=None):
+    suffix = str(path).lower().rsplit(".", 1)[-1]
+    if suffix == "stl":
+        save_stl(path, vertices, faces)
+    elif suffix == "ply":
+        save_ply(path, vertices, faces, normals)
+    else:
+        raise ValueError(f"Unknown mesh format: {path}")
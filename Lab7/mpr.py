@@ -0,0 +1,57 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+from collections import OrderedDict
+
+import numpy as np
+
+PLANES = ('axial', 'coronal', 'sagittal')
+
+
+def texture_rows(n):
+    rows = 1
+    while rows < n:
+        rows *= 2
+    return rows
+
+
+# Axial, coronal and sagittal planes of one (n, height, width) volume. The
+# plane methods return strided views and copy nothing; texture() makes the
+# contiguous array a glTexImage2D upload needs (slice axis padded with zero
+# rows to a power of two) and keeps the most recent ones per (plane, index).
+class MprVolume:
+    def __init__(self, volume, max_planes=32):
+        self.volume = volume
+        self.n, self.height, self.width = volume.shape
+        self.rows = texture_rows(self.n)
+        self.max_planes = max_planes
+        self.cache = OrderedDict()
+
+    def axial(self, index):
+        return self.volume[index]
+
+    def coronal(self, index):
+        return self.volume[:, index, :]
+
+    def sagittal(self, index):
+        return self.volume[:, :, index]
+
+    def plane(self, name, index):
+        return getattr(self, name)(index)
+
+    def texture(self, name, index):
+        if name == 'axial':
+            # Already contiguous in the volume
+            return self.axial(index)
+        key = (name, index)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        view = self.plane(name, index)
+        pixels = np.zeros((self.rows, view.shape[1]), self.volume.dtype)
+        pixels[:self.n] = view
+        self.cache[key] = pixels
+        while len(self.cache) > self.max_planes:
+            self.cache.popitem(last=False)
+        return pixels
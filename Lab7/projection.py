@@ -0,0 +1,203 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+import numpy as np
+
+from reslice import trilinear
+
+MODES = ('mip', 'minip', 'average', 'composite')
+TILE = 128
+# Accumulated opacity at which a composited ray counts as opaque
+OPAQUE = 0.99
+
+
+# Piecewise linear intensity -> (gray level, opacity) tables over 0..255.
+# Opacities are per unit step along the ray and corrected for longer steps.
+class TransferFunction:
+    def __init__(self, intensities=(0, 40, 120, 255), opacities=(0.0, 0.0, 0.02, 0.2), levels=None):
+        values = np.arange(256)
+        self.opacity = np.interp(values, intensities, opacities).astype(np.float32)
+        levels = intensities if levels is None else levels
+        self.level = np.interp(values, intensities, levels).astype(np.float32)
+        self.opacities = {1.0: self.opacity}
+
+    def opacity_table(self, step):
+        if step not in self.opacities:
+            self.opacities[step] = (1 - (1 - self.opacity) ** step).astype(np.float32)
+        return self.opacities[step]
+
+    def lookup(self, samples, step=1.0):
+        if samples.dtype == np.uint8:
+            indices = samples
+        else:
+            indices = np.clip(np.rint(samples), 0, 255).astype(np.intp)
+        return np.take(self.level, indices), np.take(self.opacity_table(step), indices)
+
+
+# Accumulators for a set of rays. The arrays hold only the rays that are
+# still marching (in the order of `active`); samples passed to add() follow
+# the same order and are NaN where a ray is outside the volume. Finished
+# rays are written to the output arrays and dropped from the working set.
+class RayState:
+    def __init__(self, mode, count):
+        self.mode = mode
+        self.active = np.arange(count)
+        self.value = np.full(count, np.inf if mode == 'minip' else 0, np.float32)
+        self.alpha = np.zeros(count, np.float32)
+        self.hits = np.zeros(count, np.int32)
+        self.final_value = np.zeros(count, np.float32)
+        self.final_hits = np.zeros(count, np.int32)
+
+    def add(self, samples, transfer, vmin, vmax, step=1.0):
+        # Integer samples come straight from the volume and are all inside
+        inside = ~np.isnan(samples) if samples.dtype.kind == 'f' else None
+        self.hits += 1 if inside is None else inside
+        if self.mode == 'mip':
+            np.fmax(self.value, samples, out=self.value)
+            done = self.value >= vmax
+        elif self.mode == 'minip':
+            np.fmin(self.value, samples, out=self.value)
+            done = self.value <= vmin
+        elif self.mode == 'average':
+            np.add(self.value, samples, out=self.value, where=True if inside is None else inside)
+            return
+        else:
+            level, opacity = transfer.lookup(samples if inside is None else np.where(inside, samples, 0), step)
+            if inside is not None:
+                opacity[~inside] = 0
+            weight = (1 - self.alpha) * opacity
+            self.value += weight * level
+            self.alpha += weight
+            done = self.alpha >= OPAQUE
+        # Early ray termination: nothing further along can change these rays
+        if done.any():
+            self.finish(done)
+
+    def finish(self, done):
+        rays = self.active[done]
+        self.final_value[rays] = self.value[done]
+        self.final_hits[rays] = self.hits[done]
+        keep = ~done
+        self.active = self.active[keep]
+        self.value, self.alpha, self.hits = self.value[keep], self.alpha[keep], self.hits[keep]
+
+    def result(self):
+        self.finish(np.ones(len(self.active), bool))
+        if self.mode == 'average':
+            return self.final_value / np.maximum(self.final_hits, 1)
+        value = self.final_value
+        value[self.final_hits == 0] = 0
+        return value
+
+
+# Orthographic projections of an (n, height, width) volume onto the image
+# grid of an ObliqueReslicer: the image plane passes through the volume
+# centre with the given normal and rays run along the normal, so the result
+# lines up with the reslicer's corners(). Axis-aligned views reduce the
+# volume along that axis in one NumPy call; other angles march rays in
+# TILE x TILE tiles on a thread pool, each tile only over the part of the
+# rays inside the volume and only for rays that are not finished yet.
+class ProjectionRenderer:
+    def __init__(self, reslicer, transfer=None, workers=None):
+        self.reslicer = reslicer
+        self.volume = reslicer.volume
+        self.spacing = reslicer.spacing
+        self.transfer = transfer or TransferFunction()
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ThreadPoolExecutor(self.workers) if self.workers > 1 else None
+        self.vmin = self.vmax = None
+
+    def render(self, normal, mode='mip'):
+        if mode not in MODES:
+            raise ValueError(f"Unknown projection mode: {mode}")
+        if self.vmax is None:
+            # Found on the first render, not at start-up: on a memory-mapped
+            # volume this reads every page
+            self.vmin, self.vmax = float(np.amin(self.volume)), float(np.amax(self.volume))
+        normal = np.asarray(normal, np.float64) / np.linalg.norm(normal)
+        axes = np.flatnonzero(np.abs(normal) > 1e-9)
+        if len(axes) == 1:
+            return self.render_axis(axes[0], normal[axes[0]] > 0, normal, mode)
+        return self.render_rays(normal, mode)
+
+    def reduce(self, axis, forward, mode):
+        if mode == 'mip':
+            return np.amax(self.volume, axis=axis, keepdims=True)
+        if mode == 'minip':
+            return np.amin(self.volume, axis=axis, keepdims=True)
+        if mode == 'average':
+            return np.mean(self.volume, axis=axis, dtype=np.float32, keepdims=True)
+        # Front-to-back over whole slices, stopping once every ray is opaque
+        shape = list(self.volume.shape)
+        shape[axis] = 1
+        state = RayState(mode, int(np.prod(shape)))
+        indices = range(self.volume.shape[axis])
+        step = self.spacing[axis] / self.spacing[2]
+        for index in (indices if forward else reversed(indices)):
+            if not len(state.active):
+                break
+            samples = np.take(self.volume, index, axis=axis).reshape(-1)
+            if len(state.active) < len(samples):
+                samples = samples[state.active]
+            state.add(samples, self.transfer, self.vmin, self.vmax, step)
+        return state.result().reshape(shape)
+
+    def render_axis(self, axis, forward, normal, mode):
+        reduced = self.reduce(axis, forward, mode)
+        offsets = self.reslicer.grid(normal)
+        center = self.reslicer.center()
+        coordinates = [offsets[i] + np.float32(center[i]) for i in range(3)]
+        coordinates[axis] = np.zeros_like(offsets[axis])
+        return trilinear(reduced, *coordinates)
+
+    def render_rays(self, normal, mode):
+        offsets = self.reslicer.grid(normal)
+        center = self.reslicer.center()
+        # One in-plane pixel along the normal, in voxel units
+        direction = (normal / self.spacing * self.spacing[2]).astype(np.float32)
+        size = self.reslicer.size
+        result = np.zeros((size, size), np.float32)
+        tiles = [(slice(row, row + TILE), slice(col, col + TILE)) for row in range(0, size, TILE) for col in range(0, size, TILE)]
+
+        def tile(window):
+            origins = np.stack([(offsets[axis][window] + np.float32(center[axis])).ravel() for axis in range(3)])
+            near, far = self.ray_range(origins, direction)
+            state = RayState(mode, origins.shape[1])
+            for t in np.arange(np.floor(near), np.ceil(far) + 1, dtype=np.float32):
+                if not len(state.active):
+                    break
+                active = origins[:, state.active]
+                samples = trilinear(self.volume, *(active[axis] + t * direction[axis] for axis in range(3)), fill=np.nan)
+                state.add(samples, self.transfer, self.vmin, self.vmax)
+            result[window] = state.result().reshape(result[window].shape)
+
+        if self.executor is None:
+            for window in tiles:
+                tile(window)
+        else:
+            list(self.executor.map(tile, tiles))
+        return result
+
+    # Smallest and largest ray parameter at which any ray of the tile is
+    # inside the volume (slab test against the voxel-coordinate box)
+    def ray_range(self, origins, direction):
+        upper = np.array(self.volume.shape, np.float64) - 1
+        near = np.full(origins.shape[1], -np.inf)
+        far = np.full(origins.shape[1], np.inf)
+        for axis in range(3):
+            if abs(direction[axis]) < 1e-12:
+                outside = (origins[axis] < 0) | (origins[axis] > upper[axis])
+                far[outside] = -np.inf
+                continue
+            first = (0 - origins[axis]) / direction[axis]
+            second = (upper[axis] - origins[axis]) / direction[axis]
+            near = np.maximum(near, np.minimum(first, second))
+            far = np.minimum(far, np.maximum(first, second))
+        hit = near <= far
+        if not hit.any():
+            return 0.0, -1.0
+        return float(near[hit].min()), float(far[hit].max())
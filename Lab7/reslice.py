@@ -0,0 +1,120 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+import numpy as np
+
+
+# Unit vectors (z, y, x) spanning the plane with the given normal: u, the
+# column direction, is the x axis projected onto the plane (the y axis for
+# near-sagittal planes), and v = u x normal, so the axial plane comes out
+# as an unflipped slice and the sagittal one with slices along the rows
+def plane_basis(normal):
+    normal = np.asarray(normal, np.float64)
+    normal = normal / np.linalg.norm(normal)
+    axis = np.array([0.0, 0.0, 1.0]) if abs(normal[2]) < 0.9 else np.array([0.0, 1.0, 0.0])
+    u = axis - np.dot(axis, normal) * normal
+    u /= np.linalg.norm(u)
+    v = np.cross(u, normal)
+    return normal, u, v
+
+
+def lerp(a, b, t):
+    return a + np.subtract(b, a, dtype=np.float32) * t
+
+
+# Trilinear interpolation of volume at the (z, y, x) voxel coordinates, with
+# `fill` outside the volume. The lower corner is clamped to size - 2 on every
+# axis (the fraction then reaches 1 on the last voxel), so one flat index plus
+# fixed offsets addresses all eight neighbours of the flattened volume.
+def trilinear(volume, z, y, x, fill=0.0):
+    shape = volume.shape
+    strides = (shape[1] * shape[2], shape[2], 1)
+    flat = volume.reshape(-1)
+    index = 0
+    inside = True
+    fractions = []
+    offsets = []
+    for coordinate, size, stride in zip((z, y, x), shape, strides):
+        inside = inside & (coordinate >= 0) & (coordinate <= size - 1)
+        lower = np.clip(np.floor(coordinate), 0, max(size - 2, 0))
+        fractions.append(coordinate - lower if size > 1 else 0)
+        offsets.append(stride if size > 1 else 0)
+        index = index + lower.astype(np.intp) * stride
+    dz, dy, dx = fractions
+    sz, sy, sx = offsets
+    corners = []
+    for plane in (index, index + sz):
+        rows = [lerp(np.take(flat, row), np.take(flat, row + sx), dx) for row in (plane, plane + sy)]
+        corners.append(lerp(rows[0], rows[1], dy))
+    result = lerp(corners[0], corners[1], dz).astype(np.float32, copy=False)
+    result[~inside] = fill
+    return result
+
+
+# Samples planes through an (n, height, width) volume. spacing is the (z, y, x)
+# voxel size, so a plane keeps its physical shape across anisotropic slices;
+# the output pixel size equals the in-plane voxel size (spacing[2]). The
+# in-plane offset grid depends only on the normal and is cached, so moving
+# the plane along its normal or to a new point only adds a vector. Row bands
+# are interpolated on a thread pool.
+class ObliqueReslicer:
+    def __init__(self, volume, spacing=(1.0, 1.0, 1.0), size=None, workers=None, max_grids=8):
+        self.volume = volume
+        self.spacing = np.asarray(spacing, np.float64)
+        extent = np.array(volume.shape) * self.spacing / self.spacing[2]
+        self.size = size or int(np.ceil(np.linalg.norm(extent)))
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ThreadPoolExecutor(self.workers) if self.workers > 1 else None
+        self.max_grids = max_grids
+        self.grids = OrderedDict()
+
+    def center(self):
+        return (np.array(self.volume.shape) - 1) / 2
+
+    # Voxel-coordinate offsets of every output pixel from the plane centre
+    def grid(self, normal):
+        _, u, v = plane_basis(normal)
+        key = (u.tobytes(), v.tobytes())
+        if key in self.grids:
+            self.grids.move_to_end(key)
+            return self.grids[key]
+        steps = (np.arange(self.size, dtype=np.float64) - (self.size - 1) / 2) * self.spacing[2]
+        scale = 1 / self.spacing
+        offsets = [
+            (steps[:, np.newaxis] * (v[axis] * scale[axis]) + steps[np.newaxis, :] * (u[axis] * scale[axis])).astype(np.float32)
+            for axis in range(3)
+        ]
+        self.grids[key] = offsets
+        while len(self.grids) > self.max_grids:
+            self.grids.popitem(last=False)
+        return offsets
+
+    # Voxel coordinates of the four plane corners, in the output's row/column order
+    def corners(self, point, normal):
+        offsets = self.grid(normal)
+        point = np.asarray(point, np.float64)
+        return [point + np.array([offsets[axis][row, col] for axis in range(3)])
+                for row, col in ((0, 0), (0, -1), (-1, -1), (-1, 0))]
+
+    # point is in voxel coordinates (z, y, x); normal is in physical (z, y, x)
+    def sample(self, point, normal, fill=0.0):
+        offsets = self.grid(normal)
+        point = np.asarray(point, np.float32)
+        result = np.empty((self.size, self.size), np.float32)
+
+        def band(rows):
+            z, y, x = (offsets[axis][rows] + point[axis] for axis in range(3))
+            result[rows] = trilinear(self.volume, z, y, x, fill)
+
+        bands = [slice(start, start + 32) for start in range(0, self.size, 32)]
+        if self.executor is None:
+            for rows in bands:
+                band(rows)
+        else:
+            list(self.executor.map(band, bands))
+        return result
@@ -0,0 +1,158 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+import numpy as np
+
+
+# Flat-index neighbours (6-connectivity) of `indices` that lie inside the
+# volume; edges along x and y are excluded with the row/column coordinates
+def neighbours(indices, shape):
+    n, height, width = shape
+    column = indices % width
+    row = indices // width % height
+    plane = height * width
+    result = [
+        indices[column > 0] - 1,
+        indices[column < width - 1] + 1,
+        indices[row > 0] - width,
+        indices[row < height - 1] + width,
+        indices[indices >= plane] - plane,
+        indices[indices < (n - 1) * plane] + plane,
+    ]
+    return np.concatenate(result)
+
+
+# Voxel states used by region_grow
+OUTSIDE, AVAILABLE, REACHED = 0, 1, 2
+
+
+# Seeded region growing: every voxel 6-connected to `seed` (z, y, x) whose
+# value is within `tolerance` of the seed value. One uint8 state per voxel
+# (built slice by slice, so the range test needs no volume-sized
+# temporaries) tells in-range voxels not reached yet from the rest, and each
+# candidate costs one lookup. The queue holds whole breadth-first fronts of
+# flat indices, so each step is a few array operations. The state volume and
+# the boolean result are the only volume-sized allocations.
+def region_grow(volume, seed, tolerance):
+    value = float(volume[tuple(seed)])
+    state = np.empty(volume.shape, np.uint8)
+    for z in range(volume.shape[0]):
+        np.logical_and(volume[z] >= value - tolerance, volume[z] <= value + tolerance, out=state[z], casting='unsafe')
+    flat = state.reshape(-1)
+    # 32-bit indices halve the memory traffic of the fronts when they fit
+    index_type = np.int32 if volume.size < 2 ** 31 else np.int64
+    front = np.array([np.ravel_multi_index(tuple(seed), volume.shape)], index_type)
+    flat[front] = REACHED
+    while len(front):
+        candidates = neighbours(front, volume.shape)
+        candidates = candidates[flat[candidates] == AVAILABLE]
+        # A voxel reached from several front voxels appears more than once
+        candidates.sort()
+        front = candidates[np.diff(candidates, prepend=-1) != 0]
+        flat[front] = REACHED
+    return state == REACHED
+
+
+# Resolves label equivalences: `pairs` are (a, b) labels known to be
+# connected. Each label is hooked to the smallest label it is joined to
+# and parents are compressed by pointer jumping until nothing changes;
+# returns the root of every label.
+def union_find(count, pairs):
+    parent = np.arange(count)
+    if not len(pairs):
+        return parent
+    first, second = pairs[:, 0], pairs[:, 1]
+    while True:
+        roots_first, roots_second = parent[first], parent[second]
+        low = np.minimum(roots_first, roots_second)
+        changed = roots_first != roots_second
+        if not changed.any():
+            return parent
+        np.minimum.at(parent, roots_first[changed], low[changed])
+        np.minimum.at(parent, roots_second[changed], low[changed])
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+
+
+# One int64 per (a, b) label pair, so pairs can be deduplicated with a plain sort
+def pair_keys(first, second):
+    return first.astype(np.int64) << 32 | second.astype(np.int64)
+
+
+# Two-pass 6-connected component labeling. Pass one gives every run of
+# foreground voxels along x a provisional label and records, slice by slice,
+# which runs touch a run in the previous row or slice; union-find merges
+# them. Pass two rewrites the provisional labels as consecutive component
+# labels 1..count. Returns the int32 label volume and the component count.
+def label_components(mask):
+    n, height, width = mask.shape
+    labels = np.zeros(mask.shape, np.int32)
+    count = 0
+    pairs = []
+    for z in range(n):
+        current = np.asarray(mask[z], bool)
+        starts = current.copy()
+        starts[:, 1:] &= ~current[:, :-1]
+        runs = np.cumsum(starts.reshape(-1), dtype=np.int32).reshape(height, width)
+        runs += count
+        runs[~current] = 0
+        labels[z] = runs
+        count += int(np.count_nonzero(starts))
+        # Runs already join voxels along x; record the ones touching along y and z
+        touching = current[1:] & current[:-1]
+        joined = [pair_keys(runs[1:][touching], runs[:-1][touching])]
+        if z:
+            touching = current & (labels[z - 1] > 0)
+            joined.append(pair_keys(runs[touching], labels[z - 1][touching]))
+        joined = np.concatenate(joined)
+        if len(joined):
+            # Neighbouring voxels mostly repeat the same pair; dropping
+            # consecutive repeats first keeps the sort small
+            joined = joined[np.append(True, joined[1:] != joined[:-1])]
+            pairs.append(np.unique(joined))
+    pairs = np.concatenate(pairs) if pairs else np.empty(0, np.int64)
+    pairs = np.stack([pairs >> 32, pairs & 0xFFFFFFFF], axis=1)
+    roots = union_find(count + 1, pairs)
+    # Consecutive labels for the roots; the background keeps label 0
+    components, relabel = np.unique(roots, return_inverse=True)
+    relabel = relabel.astype(np.int32)
+    for z in range(n):
+        labels[z] = relabel[labels[z]]
+    return labels, len(components) - 1
+
+
+# Voxel count and (z, y, x) min/max bounding box of every label 1..count
+def component_statistics(labels, count):
+    counts = np.bincount(labels.reshape(-1), minlength=count + 1)[1:]
+    lower = np.full((count + 1, 3), np.iinfo(np.int64).max)
+    upper = np.full((count + 1, 3), -1)
+    for z in range(labels.shape[0]):
+        rows, columns = np.nonzero(labels[z])
+        if not len(rows):
+            continue
+        present = labels[z, rows, columns]
+        coordinates = np.stack([np.full(len(rows), z), rows, columns], axis=1)
+        for axis in range(3):
+            np.minimum.at(lower[:, axis], present, coordinates[:, axis])
+            np.maximum.at(upper[:, axis], present, coordinates[:, axis])
+    return counts, lower[1:], upper[1:]
+
+
+# RGBA colour per label for overlays: label 0 is transparent, the others
+# cycle through a fixed random palette
+def label_palette(alpha=110, seed=7):
+    colors = np.random.default_rng(seed).integers(60, 256, (256, 3))
+    palette = np.empty((256, 4), np.uint8)
+    palette[:, :3] = colors
+    palette[:, 3] = alpha
+    palette[0] = 0
+    return palette
+
+
+def label_colors(labels, palette):
+    indices = np.where(labels > 0, (labels - 1) % 255 + 1, 0)
+    return np.take(palette, indices, axis=0)
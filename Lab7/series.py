@@ -0,0 +1,69 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+import time
+
+import numpy as np
+import pydicom
+
+
+def series_paths(directory, count, pattern="brain_{:03d}.dcm"):
+    return [directory / pattern.format(i + 1) for i in range(count)]
+
+
+def read_slice(path):
+    dcm = pydicom.read_file(str(path))
+    spacing = (dcm['0018', '0050'].value, dcm['0018', '0088'].value)
+    return dcm.pixel_array, spacing
+
+
+# Prints "Loaded i/n slices" on one line
+def print_progress(done, total, index, seconds):
+    print(f"\rLoaded {done}/{total} slices", end="\n" if done == total else "", flush=True)
+
+
+# Reads and normalizes every slice into one preallocated (n, height, width)
+# volume. Slices are decoded on a thread pool (pydicom and NumPy release the
+# GIL for file reads and most array work) and each worker writes its result
+# straight into volume[i], so the output does not depend on the order in
+# which slices finish. Returns the volume, (SliceThickness,
+# SpacingBetweenSlices) of the last slice and the per-slice load times.
+def load_series(paths, normalize=None, dtype=np.uint8, workers=None, progress=None):
+    paths = list(paths)
+    timings = np.zeros(len(paths))
+    spacings = [None] * len(paths)
+    volume = None
+
+    def load(i):
+        start = time.perf_counter()
+        pixels, spacings[i] = read_slice(paths[i])
+        volume[i] = pixels if normalize is None else normalize(pixels)
+        timings[i] = time.perf_counter() - start
+        return i
+
+    # The first slice is read up front to find the volume shape
+    start = time.perf_counter()
+    pixels, spacings[0] = read_slice(paths[0])
+    volume = np.empty((len(paths),) + pixels.shape, dtype)
+    volume[0] = pixels if normalize is None else normalize(pixels)
+    timings[0] = time.perf_counter() - start
+    if progress:
+        progress(1, len(paths), 0, timings[0])
+
+    workers = workers or min(len(paths), os.cpu_count() or 1)
+    if workers <= 1:
+        for done, i in enumerate(range(1, len(paths)), 2):
+            load(i)
+            if progress:
+                progress(done, len(paths), i, timings[i])
+    else:
+        with ThreadPoolExecutor(workers) as executor:
+            futures = [executor.submit(load, i) for i in range(1, len(paths))]
+            for done, future in enumerate(as_completed(futures), 2):
+                i = future.result()
+                if progress:
+                    progress(done, len(paths), i, timings[i])
+    return volume, spacings[-1], timings
@@ -0,0 +1,126 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import threading
+
+import numpy as np
+import pydicom
+
+from common.cache import LruCache
+
+
+# Header fields of one slice; pixel data is not read
+class SliceEntry:
+    def __init__(self, path, dcm):
+        self.path = Path(path)
+        self.instance = int(dcm.get('InstanceNumber', 0) or 0)
+        self.position = [float(value) for value in dcm.get('ImagePositionPatient', [])]
+        self.orientation = [float(value) for value in dcm.get('ImageOrientationPatient', [])]
+        self.shape = (int(dcm.Rows), int(dcm.Columns))
+        self.spacing = (float(dcm.get('SliceThickness', 1.0)), float(dcm.get('SpacingBetweenSlices', 0.0)))
+
+    # Distance along the slice normal when the position is known
+    def location(self):
+        if len(self.position) == 3 and len(self.orientation) == 6:
+            normal = np.cross(self.orientation[:3], self.orientation[3:])
+            return float(np.dot(normal, self.position))
+        return None
+
+
+# Reads the headers of every DICOM file in the directory and orders the slices
+# by position along the slice normal, falling back to InstanceNumber and then
+# to the file name. Files that are not DICOM images are skipped.
+def index_series(directory, pattern="*.dcm"):
+    entries = []
+    for path in sorted(Path(directory).glob(pattern)):
+        try:
+            dcm = pydicom.read_file(str(path), stop_before_pixels=True)
+        except pydicom.errors.InvalidDicomError:
+            continue
+        if 'Rows' in dcm and 'Columns' in dcm:
+            entries.append(SliceEntry(path, dcm))
+    locations = [entry.location() for entry in entries]
+    if entries and None not in locations:
+        order = np.argsort(locations, kind='stable')
+    else:
+        order = np.argsort([entry.instance for entry in entries], kind='stable')
+    return [entries[i] for i in order]
+
+
+# Slices of a series decoded on first access and kept in an LRU cache bounded
+# in bytes, so only the slices being looked at need to fit in memory.
+# store[i] (or store[i, rows, columns]) returns one slice, so MprVolume serves
+# axial planes from it unchanged. Coronal and sagittal planes would need every
+# slice of the series and are refused: once the series is larger than the
+# cache, each such plane would evict and decode the whole series again.
+# prefetch() decodes upcoming slices on a background thread.
+class SliceStore:
+    def __init__(self, entries, normalize=None, dtype=np.uint8, max_bytes=256 * 2 ** 20, workers=1):
+        self.entries = list(entries)
+        self.normalize = normalize
+        self.dtype = np.dtype(dtype)
+        self.shape = (len(self.entries),) + self.entries[0].shape
+        self.ndim = 3
+        self.cache = LruCache(max_bytes)
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.executor = ThreadPoolExecutor(workers)
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def nbytes(self):
+        return self.cache.size
+
+    @property
+    def spacing(self):
+        return self.entries[-1].spacing
+
+    def decode(self, index):
+        pixels = pydicom.read_file(str(self.entries[index].path)).pixel_array
+        if self.normalize is not None:
+            pixels = self.normalize(pixels)
+        return np.ascontiguousarray(pixels, self.dtype)
+
+    def load(self, index):
+        pixels = self.decode(index)
+        with self.lock:
+            self.cache.put(index, pixels)
+            self.pending.pop(index, None)
+        return pixels
+
+    def slice(self, index):
+        with self.lock:
+            pixels = self.cache.get(index)
+            future = self.pending.get(index)
+        if pixels is not None:
+            return pixels
+        # Wait for a prefetch already decoding this slice instead of repeating it
+        if future is not None:
+            return future.result()
+        return self.load(index)
+
+    def prefetch(self, indices):
+        for index in indices:
+            if not 0 <= index < len(self):
+                continue
+            with self.lock:
+                if index in self.cache or index in self.pending:
+                    continue
+                self.pending[index] = self.executor.submit(self.load, index)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        first, rest = key[0], key[1:]
+        if not isinstance(first, (int, np.integer)):
+            raise IndexError("SliceStore returns single slices; index the first axis with an integer")
+        pixels = self.slice(int(first))
+        return pixels[rest] if rest else pixels
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,76 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+from OpenGL.GL import *
+
+from mpr import PLANES
+
+
+# One texture object per MPR plane, allocated once. bind() uploads a plane
+# with glTexSubImage2D only when its slice index differs from the one already
+# in the texture, so redraws that only change the view upload nothing.
+# With `colors` (a function from plane pixels to an RGBA uint8 image) the
+# textures are RGBA, e.g. for label overlays.
+class PlaneTextures:
+    def __init__(self, mpr, colors=None):
+        self.mpr = mpr
+        self.colors = colors
+        self.format = GL_LUMINANCE if colors is None else GL_RGBA
+        self.sizes = {
+            'axial': (mpr.width, mpr.height),
+            'coronal': (mpr.width, mpr.rows),
+            'sagittal': (mpr.height, mpr.rows),
+        }
+        self.ids = dict(zip(PLANES, glGenTextures(len(PLANES))))
+        self.indices = dict.fromkeys(PLANES)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        for name in PLANES:
+            width, height = self.sizes[name]
+            glBindTexture(GL_TEXTURE_2D, self.ids[name])
+            glTexImage2D(GL_TEXTURE_2D, 0, self.format, width, height, 0, self.format, GL_UNSIGNED_BYTE, None)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP)
+
+    def bind(self, name, index):
+        glBindTexture(GL_TEXTURE_2D, self.ids[name])
+        if self.indices[name] != index:
+            pixels = self.mpr.texture(name, index)
+            if self.colors is not None:
+                pixels = self.colors(pixels)
+            width, height = self.sizes[name]
+            glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, width, height, self.format, GL_UNSIGNED_BYTE, pixels)
+            self.indices[name] = index
+
+    def delete(self):
+        glDeleteTextures(list(self.ids.values()))
+
+
+# A single texture for images computed on the CPU (oblique slices,
+# projections); update() re-specifies it only when the size changes
+class ImageTexture:
+    def __init__(self):
+        self.id = glGenTextures(1)
+        self.shape = None
+        glBindTexture(GL_TEXTURE_2D, self.id)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP)
+
+    def update(self, pixels):
+        height, width = pixels.shape
+        glBindTexture(GL_TEXTURE_2D, self.id)
+        if self.shape != pixels.shape:
+            glTexImage2D(GL_TEXTURE_2D, 0, GL_LUMINANCE, width, height, 0, GL_LUMINANCE, GL_UNSIGNED_BYTE, pixels)
+            self.shape = pixels.shape
+        else:
+            glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, width, height, GL_LUMINANCE, GL_UNSIGNED_BYTE, pixels)
+
+    def bind(self):
+        glBindTexture(GL_TEXTURE_2D, self.id)
+
+    def delete(self):
+        glDeleteTextures([self.id])
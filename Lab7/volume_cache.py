@@ -0,0 +1,127 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+# Bump when the stored volume changes for the same input files (e.g. a new
+# normalization), so old entries stop matching
+FORMAT_VERSION = 1
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "lab7"
+
+
+def digest(text):
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+# Identifies the series by its file names only. A non-empty `variant` tells
+# apart different volumes derived from the same files (e.g. resampled ones).
+def series_id(paths, variant=''):
+    names = [str(Path(path).resolve()) for path in paths]
+    return digest("\n".join([variant] + names if variant else names))
+
+
+# Identifies this exact state of the series: file names, sizes and mtimes
+def series_key(paths, version=FORMAT_VERSION, variant=''):
+    lines = [str(version), variant] if variant else [str(version)]
+    for path in paths:
+        stat = os.stat(path)
+        lines.append(f"{Path(path).resolve()}|{stat.st_size}|{stat.st_mtime_ns}")
+    return digest("\n".join(lines))
+
+
+# Normalized volumes stored as <key>.npy with a <key>.json sidecar holding the
+# spacing metadata. Volumes are opened with mmap_mode='r', so a cached series
+# is available at once and pages are read as slices are first displayed.
+# An entry for the same files with different sizes or mtimes is stale and is
+# removed when the new one is stored; the least recently used entries are
+# dropped once the directory exceeds max_bytes.
+class VolumeCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=2 * 2 ** 30):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def volume_path(self, key):
+        return self.directory / f"{key}.npy"
+
+    def metadata_path(self, key):
+        return self.directory / f"{key}.json"
+
+    def entries(self):
+        if not self.directory.is_dir():
+            return []
+        return [path.stem for path in self.directory.glob("*.json")]
+
+    def read_metadata(self, key):
+        try:
+            with open(self.metadata_path(key)) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, paths, variant=''):
+        key = series_key(paths, variant=variant)
+        metadata = self.read_metadata(key)
+        if metadata is None or not self.volume_path(key).exists():
+            return None
+        volume = np.load(self.volume_path(key), mmap_mode='r')
+        if list(volume.shape) != metadata['shape']:
+            self.remove(key)
+            return None
+        # The sidecar's mtime records the last use for eviction
+        os.utime(self.metadata_path(key))
+        return volume, tuple(metadata['spacing'])
+
+    def store(self, paths, volume, spacing, variant=''):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        key = series_key(paths, variant=variant)
+        series = series_id(paths, variant)
+        for other in self.entries():
+            metadata = self.read_metadata(other)
+            if other != key and (metadata is None or metadata.get('series') == series):
+                self.remove(other)
+        # Written under temporary names and renamed, so a crash never leaves
+        # a half-written entry behind
+        temporary = self.directory / f"{key}.npy.tmp"
+        with open(temporary, "wb") as file:
+            np.save(file, volume)
+        os.replace(temporary, self.volume_path(key))
+        metadata = {
+            'series': series,
+            'shape': list(volume.shape),
+            'dtype': volume.dtype.str,
+            'spacing': [float(value) for value in spacing],
+            'files': [str(Path(path).resolve()) for path in paths],
+        }
+        temporary = self.directory / f"{key}.json.tmp"
+        with open(temporary, "w") as file:
+            json.dump(metadata, file)
+        os.replace(temporary, self.metadata_path(key))
+        self.trim(keep=key)
+        return key
+
+    def remove(self, key):
+        for path in (self.volume_path(key), self.metadata_path(key)):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def size(self, key):
+        path = self.volume_path(key)
+        return path.stat().st_size if path.exists() else 0
+
+    def trim(self, keep=None):
+        keys = sorted(self.entries(), key=lambda key: self.metadata_path(key).stat().st_mtime)
+        total = sum(self.size(key) for key in keys)
+        for key in keys:
+            if total <= self.max_bytes:
+                break
+            if key != keep:
+                total -= self.size(key)
+                self.remove(key)
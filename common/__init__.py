@@ -0,0 +1,6 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+# Image processing routines shared by several labs. Lab scripts put the
+# repository root on sys.path before importing from here.
@@ -0,0 +1,50 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+from collections import OrderedDict
+import hashlib
+
+import numpy as np
+
+
+# Content key for caching per-image results: shape, dtype and a hash of the pixels
+def image_key(pixels):
+    pixels = np.ascontiguousarray(pixels)
+    digest = hashlib.blake2b(pixels, digest_size=16).hexdigest()
+    return pixels.shape, pixels.dtype.str, digest
+
+
+# Least-recently-used store for arrays, bounded by their total size in bytes.
+# Values larger than the whole budget are not kept.
+class LruCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        if key not in self.entries:
+            return default
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key, value):
+        if key in self.entries:
+            self.size -= self.entries.pop(key).nbytes
+        if value.nbytes > self.max_bytes:
+            return
+        self.entries[key] = value
+        self.size += value.nbytes
+        while self.size > self.max_bytes:
+            self.size -= self.entries.popitem(last=False)[1].nbytes
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
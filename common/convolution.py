@@ -0,0 +1,64 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+import numpy as np
+
+# Border modes understood by convolve and the np.pad mode that implements them
+BORDER_MODES = {
+    'zero': 'constant',
+    'mirror': 'reflect',
+    'replicate': 'edge',
+    'wrap': 'wrap',
+}
+
+
+def pad(pixels, kernel_shape, border='zero', dtype=np.float32):
+    if border not in BORDER_MODES:
+        raise ValueError(f"Unknown border mode: {border}")
+    widths = [(size // 2, size - 1 - size // 2) for size in kernel_shape]
+    return np.pad(np.asarray(pixels, dtype), widths, mode=BORDER_MODES[border])
+
+
+# Rank-1 kernels split into a column and a row vector: kernel == outer(column, row)
+def separate(kernel, tolerance=1e-6):
+    kernel = np.asarray(kernel, np.float64)
+    if kernel.ndim != 2 or min(kernel.shape) == 1:
+        return None
+    u, s, vt = np.linalg.svd(kernel)
+    if s[0] == 0 or s[1] > tolerance * s[0]:
+        return None
+    scale = np.sqrt(s[0])
+    return u[:, 0] * scale, vt[0] * scale
+
+
+def accumulate(padded, weights, shape, axes, dtype):
+    result = np.zeros(shape, dtype)
+    scratch = np.empty(shape, dtype)
+    for offset, weight in np.ndenumerate(weights):
+        if weight == 0:
+            continue
+        view = padded[tuple(slice(o, o + n) if a else slice(None) for o, n, a in zip(offset, shape, axes))]
+        np.multiply(view, weight, out=scratch, casting='unsafe')
+        result += scratch
+    return result
+
+
+# Applies the kernel the way the lab filters always have: each output pixel is
+# the weighted sum of its neighbourhood, kernel[0][0] weighting the top-left
+# neighbour (correlation, the kernel is not flipped). Borders are handled by
+# padding, so there is no per-pixel branching, and all sums are accumulated
+# in `dtype`.
+def convolve(pixels, kernel, border='zero', dtype=np.float32, separable=None):
+    kernel = np.asarray(kernel, dtype)
+    if kernel.ndim == 1:
+        kernel = kernel[np.newaxis, :]
+    height, width = np.shape(pixels)
+    padded = pad(pixels, kernel.shape, border, dtype)
+    if separable is None:
+        separable = separate(kernel)
+    if separable:
+        column, row = (np.asarray(vector, dtype) for vector in separable)
+        rows = accumulate(padded, row[np.newaxis, :], (padded.shape[0], width), (False, True), dtype)
+        return accumulate(rows, column[:, np.newaxis], (height, width), (True, False), dtype)
+    return accumulate(padded, kernel, (height, width), (True, True), dtype)
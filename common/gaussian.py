@@ -0,0 +1,109 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+import numpy as np
+
+from common.convolution import accumulate, convolve, pad
+
+# Sigma from which gaussian_filter switches from two 1D passes to FFT
+# convolution, by image size: (largest pixel count, sigma). The FFT cost
+# barely grows with sigma while the separable one grows linearly, so the
+# crossover falls as images get larger; Lab5/bench_gaussian.py measures it
+# at sigma 8 on 256x256 slices, 6 on 512x512 and 4 on 1024x1024.
+FFT_SIGMAS = ((256 * 256, 8.0), (512 * 512, 6.0), (None, 4.0))
+
+
+def fft_sigma(shape):
+    pixels = int(np.prod(shape))
+    for limit, sigma in FFT_SIGMAS:
+        if limit is None or pixels <= limit:
+            return sigma
+
+
+def gaussian_kernel(sigma, truncate=4.0):
+    radius = max(int(truncate * sigma + 0.5), 1)
+    x = np.arange(-radius, radius + 1, dtype=np.float64)
+    kernel = np.exp(-0.5 * (x / sigma) ** 2)
+    return kernel / kernel.sum()
+
+
+# Second derivative of the Gaussian, corrected to sum to zero (flat areas give
+# no response) and scaled so that it maps x^2 to 2
+def gaussian_second_derivative(sigma, truncate=4.0):
+    kernel = gaussian_kernel(sigma, truncate)
+    x = np.arange(len(kernel)) - len(kernel) // 2
+    second = (x ** 2 / sigma ** 4 - 1 / sigma ** 2) * kernel
+    second -= second.mean()
+    return second * (2 / np.sum(x ** 2 * second))
+
+
+# Laplacian of Gaussian in one pass: LoG = G''(x)G(y) + G(x)G''(y), so the
+# image is padded once, filtered along rows with G and G'', and each row
+# result is finished along columns with the other kernel
+def laplacian_of_gaussian(pixels, sigma, border='mirror', truncate=4.0, dtype=np.float32):
+    kernel = gaussian_kernel(sigma, truncate).astype(dtype)
+    second = gaussian_second_derivative(sigma, truncate).astype(dtype)
+    height, width = np.shape(pixels)
+    padded = pad(pixels, (len(kernel), len(kernel)), border, dtype)
+    row_shape = (padded.shape[0], width)
+    smooth_rows = accumulate(padded, kernel[np.newaxis, :], row_shape, (False, True), dtype)
+    second_rows = accumulate(padded, second[np.newaxis, :], row_shape, (False, True), dtype)
+    result = accumulate(smooth_rows, second[:, np.newaxis], (height, width), (True, False), dtype)
+    result += accumulate(second_rows, kernel[:, np.newaxis], (height, width), (True, False), dtype)
+    return result
+
+
+# Smallest 2^a * 3^b * 5^c >= n, a size the FFT handles efficiently
+def next_fast_length(n):
+    best = 2 * n
+    power5 = 1
+    while power5 < best:
+        power35 = power5
+        while power35 < best:
+            length = power35
+            while length < n:
+                length *= 2
+            best = min(best, length)
+            power35 *= 3
+        power5 *= 5
+    return best
+
+
+def gaussian_separable(pixels, sigma, border='mirror', truncate=4.0, dtype=np.float32):
+    kernel = gaussian_kernel(sigma, truncate)
+    return convolve(pixels, np.outer(kernel, kernel), border, dtype, separable=(kernel, kernel))
+
+
+# The image is padded by the kernel radius with the requested border mode and
+# circularly convolved with the kernel centred at index 0; the padding keeps
+# the wrap-around out of the region that is returned. The kernel transform is
+# built from the two 1D transforms because the Gaussian is separable.
+def gaussian_fft(pixels, sigma, border='mirror', truncate=4.0, dtype=np.float32):
+    kernel = gaussian_kernel(sigma, truncate)
+    radius = len(kernel) // 2
+    height, width = np.shape(pixels)
+    padded = pad(pixels, (len(kernel), len(kernel)), border, dtype)
+    shape = (next_fast_length(padded.shape[0]), next_fast_length(padded.shape[1]))
+    transforms = []
+    for axis, length in enumerate(shape):
+        centred = np.zeros(length)
+        centred[:radius + 1] = kernel[radius:]
+        centred[length - radius:] = kernel[:radius]
+        transforms.append(np.fft.rfft(centred) if axis == 1 else np.fft.fft(centred))
+    spectrum = np.fft.rfft2(padded, shape)
+    spectrum *= transforms[0][:, np.newaxis] * transforms[1][np.newaxis, :]
+    result = np.fft.irfft2(spectrum, shape)
+    return result[radius:radius + height, radius:radius + width].astype(dtype)
+
+
+def gaussian_filter(pixels, sigma, border='mirror', method='auto', truncate=4.0, dtype=np.float32):
+    if sigma <= 0:
+        return np.array(pixels, dtype)
+    if method == 'auto':
+        method = 'fft' if sigma >= fft_sigma(np.shape(pixels)) else 'separable'
+    if method == 'fft':
+        return gaussian_fft(pixels, sigma, border, truncate, dtype)
+    if method == 'separable':
+        return gaussian_separable(pixels, sigma, border, truncate, dtype)
+    raise ValueError(f"Unknown Gaussian method: {method}")
@@ -0,0 +1,44 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+import numpy as np
+
+from common.convolution import pad
+
+
+def accumulator_type(pixels):
+    return np.int64 if np.asarray(pixels).dtype.kind in 'iub' else np.float64
+
+
+# Summed-area table with a leading row and column of zeros, so that
+# table[i, j] is the sum of pixels[:i, :j]
+def integral_image(pixels, dtype=np.int64):
+    table = np.zeros((pixels.shape[0] + 1, pixels.shape[1] + 1), dtype)
+    np.cumsum(pixels, axis=0, dtype=dtype, out=table[1:, 1:])
+    np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+    return table
+
+
+def box_sum(table, top, left, bottom, right):
+    return table[bottom, right] - table[top, right] - table[bottom, left] + table[top, left]
+
+
+# Sum over the window x window box centred on every pixel; the cost does not
+# depend on the window size
+def box_sums(pixels, window, border='zero', dtype=None):
+    dtype = dtype or accumulator_type(pixels)
+    table = integral_image(pad(pixels, (window, window), border, dtype), dtype)
+    return table[window:, window:] - table[:-window, window:] - table[window:, :-window] + table[:-window, :-window]
+
+
+# Local mean and standard deviation over a window x window box; with the
+# 'zero' border, pixels outside the image count as zeros
+def local_statistics(pixels, window, border='zero'):
+    dtype = accumulator_type(pixels)
+    count = window * window
+    mean = box_sums(pixels, window, border, dtype) / count
+    variance = box_sums(np.square(pixels, dtype=dtype), window, border, dtype) / count
+    variance -= mean ** 2
+    np.maximum(variance, 0, out=variance)
+    return mean, np.sqrt(variance, out=variance)
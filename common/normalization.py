@@ -0,0 +1,58 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+import numpy as np
+
+MODES = ('fraction', 'percentile', 'minmax')
+
+
+# Percentiles read off the cumulative histogram instead of a full sort; integer
+# images get one bin per value, float images are binned approximately
+def histogram_percentiles(pixels, percentiles, bins=4096):
+    pixels = np.asarray(pixels)
+    if pixels.dtype.kind in 'iub':
+        min_value = int(np.amin(pixels))
+        counts = np.bincount(np.subtract(pixels, min_value, dtype=np.intp).ravel())
+        edges = np.arange(len(counts)) + min_value
+    else:
+        counts, bin_edges = np.histogram(pixels, bins)
+        edges = bin_edges[1:]
+    cdf = np.cumsum(counts)
+    ranks = np.asarray(percentiles, np.float64) / 100 * cdf[-1]
+    indices = np.minimum(np.searchsorted(cdf, ranks, side='left'), len(edges) - 1)
+    return tuple(edges[indices].tolist())
+
+
+def normalization_range(pixels, mode='fraction', fractions=(0.25, 0.85), percentiles=(1.0, 99.0)):
+    if mode == 'fraction':
+        maximum = float(np.amax(pixels))
+        return int(maximum * fractions[0]), int(maximum * fractions[1])
+    if mode == 'percentile':
+        return histogram_percentiles(pixels, percentiles)
+    if mode == 'minmax':
+        return np.amin(pixels).item(), np.amax(pixels).item()
+    raise ValueError(f"Unknown normalization mode: {mode}")
+
+
+# Linearly maps [low, high] of the chosen range onto [0, new_max] with clamping
+# and writes the result into `out` (allocated with `dtype` when not given).
+# Integer images go through a LUT over their value range, so no per-pixel
+# float array is created; float images use a float32 temporary.
+def normalize(pixels, mode='fraction', dtype=np.int16, new_max=None, out=None, **range_options):
+    pixels = np.asarray(pixels)
+    out = np.empty(pixels.shape, dtype) if out is None else out
+    new_max = np.iinfo(out.dtype).max if new_max is None else new_max
+    low, high = normalization_range(pixels, mode, **range_options)
+    span = (high - low) or 1
+    if pixels.dtype.kind in 'iub':
+        min_value = int(np.amin(pixels))
+        values = np.arange(min_value, int(np.amax(pixels)) + 1, dtype=np.float64)
+        lut = np.clip((values - low) / span * new_max, 0, new_max).astype(out.dtype)
+        np.take(lut, np.subtract(pixels, min_value, dtype=np.intp), out=out)
+    else:
+        scaled = np.subtract(pixels, low, dtype=np.float32)
+        scaled *= new_max / span
+        np.clip(scaled, 0, new_max, out=scaled)
+        out[...] = scaled
+    return out
@@ -0,0 +1,43 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+from pathlib import Path
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "Lab5"))
+from edges import zero_crossings
+
+
+def marked(response, threshold=0.0):
+    return np.argwhere(zero_crossings(np.array(response, np.float32), threshold)).tolist()
+
+
+@pytest.mark.parametrize("values", [(-1, 0, 1), (1, 0, -1)])
+def test_zero_between_opposite_signs_along_rows_and_columns(values):
+    row = [list(values)]
+    assert marked(row) == [[0, 1]]
+    column = [[value] for value in values]
+    assert marked(column) == [[1, 0]]
+
+
+def test_zero_between_same_signs_is_not_a_crossing():
+    assert marked([[-1, 0, -1]]) == []
+    assert marked([[1, 0, 1]]) == []
+
+
+def test_negative_side_of_a_sign_change_is_marked():
+    assert marked([[-1, 2]]) == [[0, 0]]
+    assert marked([[2, -1]]) == [[0, 1]]
+    assert marked([[2], [-1]]) == [[1, 0]]
+
+
+def test_threshold_drops_weak_crossings():
+    assert marked([[-1, 0, 1]], threshold=2.5) == []
+    assert marked([[-1, 0, 1]], threshold=1.5) == [[0, 1]]
+    assert marked([[-1, 2]], threshold=3.5) == []
+    assert marked([[-1, 2]], threshold=2.5) == [[0, 0]]
@@ -0,0 +1,29 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+from pathlib import Path
+import sys
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "Lab2"))
+import equalization
+
+
+def test_clahe_image_smaller_than_tile_grid():
+    pixels = np.arange(15, dtype=np.uint16).reshape(3, 5) * 100
+    with np.errstate(all='raise'):
+        result = equalization.clahe(pixels, np.uint16, 4095, tiles=(8, 8))
+    # The grid is clamped to one tile per pixel
+    expected = equalization.clahe(pixels, np.uint16, 4095, tiles=(3, 5))
+    assert np.array_equal(result, expected)
+
+
+def test_clahe_single_pixel():
+    result = equalization.clahe(np.array([[7]], np.uint8), np.uint8, 255)
+    assert result.shape == (1, 1)
+
+
+def test_equalization_lut_of_empty_histogram():
+    assert np.all(equalization.equalization_lut(np.zeros(16), 255) == 0)
@@ -0,0 +1,36 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+import importlib
+from pathlib import Path
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "Lab5"))
+lab5 = importlib.import_module("03_Lab5")
+
+
+# The '4' key must use the sigma and threshold tuned with +/- and [/]
+def test_log_key_uses_adjusted_parameters(monkeypatch):
+    calls = []
+
+    def log_edges(pixels, sigma, threshold):
+        calls.append((sigma, threshold))
+        return np.zeros(np.shape(pixels), bool)
+
+    monkeypatch.setattr(lab5, "log_edges", log_edges)
+    for name in ("zagruzka_texturi", "otobrajeni3", "glEnable"):
+        monkeypatch.setattr(lab5, name, lambda *args: None)
+    monkeypatch.setattr(lab5, "tip_izobrajeni9", np.dtype(np.int16), raising=False)
+    monkeypatch.setattr(lab5, "max_9rkost", 32767, raising=False)
+    monkeypatch.setattr(lab5, "norm_pixeli", np.zeros((4, 4), np.int16), raising=False)
+    monkeypatch.setattr(lab5, "sigma_gaussa", 1.0, raising=False)
+    monkeypatch.setattr(lab5, "porog_nahila", 0.0, raising=False)
+    monkeypatch.setattr(lab5, "tekushiy_etap", None, raising=False)
+    monkeypatch.setattr(lab5, "konveyer", lab5.sozdanie_konveyera(2 ** 20), raising=False)
+    for key in (b'+', b']', b'4'):
+        lab5.najati3(key, 0, 0)
+    assert calls == [(pytest.approx(1.25), lab5.SHAG_POROGA)]
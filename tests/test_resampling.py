@@ -0,0 +1,58 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+from pathlib import Path
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "Lab6"))
+from resampling import AffineResampler
+from transforms import rotation_matrix, shear_matrix
+
+# Texture coordinate (s, t) -> vertex of the quad drawn by Lab6's display()
+# for an image `width` pixels wide, from its four glTexCoord/glVertex pairs
+def quad_point(s, t, width):
+    return np.array([width / 2 - t * width, width / 2 - s * width])
+
+
+# Where GL draws the centre of source pixel (row, column) after
+# glMultMatrixf(matrix), in output pixel (row, column) coordinates
+def gl_destination(matrix, row, column, shape):
+    height, width = shape
+    x, y = quad_point((column + 0.5) / width, (row + 0.5) / height, width)
+    moved = np.asarray(matrix).reshape(4, 4).T @ np.array([x, y, 0.0, 1.0])
+    x, y = moved[:2] / moved[3]
+    t, s = (width / 2 - x) / width, (width / 2 - y) / width
+    return t * height - 0.5, s * width - 0.5
+
+
+@pytest.mark.parametrize("matrix", [rotation_matrix(90), rotation_matrix(-90)])
+def test_rotation_matches_gl(matrix):
+    pixels = np.arange(64, dtype=np.uint16).reshape(8, 8)
+    result = AffineResampler().apply(pixels, matrix, 'nearest')
+    expected = np.zeros_like(pixels)
+    for row, column in np.ndindex(pixels.shape):
+        destination = np.rint(gl_destination(matrix, row, column, pixels.shape)).astype(int)
+        expected[tuple(destination)] = pixels[row, column]
+    assert np.array_equal(result, expected)
+
+
+# A single bright pixel must end up next to where GL draws it
+def assert_marker_follows_gl(shape, marker, matrix):
+    pixels = np.zeros(shape, np.float32)
+    pixels[marker] = 1
+    result = AffineResampler().apply(pixels, matrix, 'bilinear')
+    row, column = gl_destination(matrix, *marker, shape)
+    peak = np.unravel_index(np.argmax(result), shape)
+    assert abs(peak[0] - row) < 1 and abs(peak[1] - column) < 1
+
+
+def test_marker_follows_gl_rotation():
+    assert_marker_follows_gl((8, 8), (2, 5), rotation_matrix(30))
+
+
+def test_marker_follows_gl_shear_and_rotation_on_non_square_image():
+    assert_marker_follows_gl((12, 20), (3, 4), shear_matrix(0.2, 0.1) @ rotation_matrix(40))
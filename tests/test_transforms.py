@@ -0,0 +1,28 @@
+# Copyright © 2020. All rights reserved.
+# Authors: Vitalii Babenko
+# Contacts: vbabenko2191@gmail.com
+
+import json
+from pathlib import Path
+import sys
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "Lab6"))
+from transforms import lab_stack, load_parameters
+
+
+def test_integer_sequence_steps(tmp_path):
+    path = tmp_path / "transforms.json"
+    path.write_text(json.dumps({"shear": [0.1, 0.0], "angle": 30, "sequence": [1, 1, -1]}))
+    shear, angle, sequence = load_parameters(path)
+    assert sequence == ["1", "1", "-1"]
+    stack = lab_stack(shear, angle)
+    stack.replay(sequence)
+    assert np.allclose(stack.matrix, lab_stack(shear, angle).push('1'))
+
+
+def test_string_sequence_steps(tmp_path):
+    path = tmp_path / "transforms.json"
+    path.write_text(json.dumps({"sequence": ["1", "-1"]}))
+    assert load_parameters(path)[2] == ["1", "-1"]